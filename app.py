@@ -2,10 +2,14 @@ from fastapi import FastAPI, Request, Form
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from project.pipeline.agents import AgentWorkflow
-from project.logger.logging import get_logger
+from project.utils.admission import AdmissionController, OverloadedError
+from project.utils.config_loader import load_config
+from project.utils.model_loader import gateway_metrics
+from project.utils import profiling
+from project.logger.logging import get_logger, get_request_id, get_stage_timings, request_context
 import uvicorn
 import asyncio
+import time
 from contextlib import asynccontextmanager
 
 logger = get_logger(__name__)
@@ -14,6 +18,45 @@ logger = get_logger(__name__)
 agent = None
 initialization_complete = False
 initialization_error = None
+admission = AdmissionController.from_config(load_config())
+
+
+def _build_agent():
+    # Heavy ML dependencies are imported here, off the event loop, so the
+    # server binds and answers /health before they finish loading
+    from project.pipeline.agents import AgentWorkflow
+    workflow = AgentWorkflow()
+    workflow.setup(use_attention_paper=True)
+    return workflow
+
+
+def _answer(
+    query: str,
+    collection: str,
+    degraded: bool,
+    profile_name: str = None,
+    trace_allocations: bool = False
+) -> str:
+    if profile_name is None:
+        return agent.run(query, collection=collection, degraded=degraded)
+    
+    # Sampled traffic gets CPU sampling only; allocation tracing is opt-in
+    with profiling.capture(trace_frames=None if trace_allocations else 0) as profile:
+        answer = agent.run(query, collection=collection, degraded=degraded)
+    if profile is None:
+        logger.debug("Another capture is running, request not profiled")
+        return answer
+    
+    paths = profile.save(
+        profiling.PROFILING_CONFIG.get('output_dir', 'logs/profiles'),
+        profile_name,
+        keep=profiling.PROFILING_CONFIG.get('max_saved_profiles', 20)
+    )
+    logger.info(
+        f"Request profile written to {paths['collapsed']}",
+        extra={"profile": profile.summary()}
+    )
+    return answer
 
 
 async def initialize_rag_pipeline():
@@ -21,8 +64,7 @@ async def initialize_rag_pipeline():
     global agent, initialization_complete, initialization_error
     try:
         logger.info("Initializing RAG pipeline in background...")
-        agent = AgentWorkflow()
-        agent.setup(use_attention_paper=True)
+        agent = await asyncio.to_thread(_build_agent)
         initialization_complete = True
         logger.info("RAG pipeline ready")
     except Exception as e:
@@ -44,6 +86,26 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(title="Learn with Transformers", lifespan=lifespan)
 
+@app.middleware("http")
+async def request_logging(request: Request, call_next):
+    """Binds a request id for structured logs and records per-stage timings"""
+    with request_context(request.headers.get("x-request-id")) as request_id:
+        start = time.perf_counter()
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        if request.url.path == "/search":
+            logger.info(
+                "Search request completed",
+                extra={
+                    "path": request.url.path,
+                    "status_code": response.status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "stage_timings": get_stage_timings(),
+                }
+            )
+        return response
+
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
@@ -67,11 +129,37 @@ async def readiness():
             {"status": "initializing"}, 
             status_code=503
         )
+    if admission.overloaded:
+        return JSONResponse(
+            {"status": "overloaded", "retry_after": admission.retry_after()},
+            status_code=503
+        )
     return JSONResponse({"status": "ready"}, status_code=200)
 
 
+@app.get("/metrics")
+async def metrics():
+    """LLM gateway and request admission queue metrics"""
+    return JSONResponse(
+        {"llm_gateway": gateway_metrics(), "admission": admission.metrics()},
+        status_code=200
+    )
+
+
+@app.get("/collections")
+async def collections():
+    """Available document collections and which are currently resident"""
+    if not initialization_complete or initialization_error:
+        return JSONResponse({"status": "initializing"}, status_code=503)
+    manager = agent.rag_pipeline.collections
+    return JSONResponse(
+        {"collections": manager.list_collections(), "resident": manager.resident_collections()},
+        status_code=200
+    )
+
+
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
+async def home(request: Request, collection: str = None):
     if not initialization_complete:
         return templates.TemplateResponse(
             "index.html", 
@@ -82,11 +170,16 @@ async def home(request: Request):
             "index.html", 
             {"request": request, "error": f"Initialization failed: {initialization_error}"}
         )
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse("index.html", {"request": request, "collection": collection})
 
 
 @app.post("/search", response_class=HTMLResponse)
-async def search(request: Request, query: str = Form(...)):
+async def search(
+    request: Request,
+    query: str = Form(...),
+    collection: str = Form(None),
+    profile: str = Form(None)
+):
     if initialization_error:
         return templates.TemplateResponse(
             "index.html", 
@@ -105,11 +198,28 @@ async def search(request: Request, query: str = Form(...)):
             {"request": request, "error": "Please enter a question"}
         )
     
+    profile_name = None
+    profile_reason = profiling.should_profile(profile or request.headers.get("x-profile"))
+    if profile_reason:
+        profile_name = f"{time.strftime('%Y%m%d_%H%M%S')}_{get_request_id()}"
+    
     try:
-        answer = agent.run(query)
+        async with admission.admit() as ticket:
+            answer = await asyncio.to_thread(
+                _answer, query, collection or None, ticket.degraded, profile_name,
+                profile_reason == "opt_in"
+            )
+        return templates.TemplateResponse(
+            "index.html",
+            {"request": request, "query": query, "answer": answer, "collection": collection}
+        )
+    except OverloadedError as e:
+        logger.warning(f"Search shed: {str(e)}")
         return templates.TemplateResponse(
             "index.html",
-            {"request": request, "query": query, "answer": answer}
+            {"request": request, "query": query, "error": "The service is busy. Please try again shortly"},
+            status_code=e.status_code,
+            headers={"Retry-After": str(e.retry_after)}
         )
     except Exception as e:
         logger.error(f"Search failed: {str(e)}")
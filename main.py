@@ -1,12 +1,19 @@
 import os
+import sys
+import argparse
 from dotenv import load_dotenv
-from project.pipeline.agents import AgentWorkflow
 from project.logger.logging import get_logger
 
 load_dotenv()
 
 logger = get_logger(__name__)
 
+DEMO_QUESTIONS = [
+    "What is the attention mechanism in transformers?",
+    "Explain the multi-head attention.",
+    "What are the advantages of the transformer architecture?"
+]
+
 
 def setup_langsmith():
     langsmith_api_key = os.getenv("LANGSMITH_API_KEY")
@@ -20,10 +27,92 @@ def setup_langsmith():
         logger.warning("LANGSMITH_API_KEY not found, tracing disabled")
 
 
+def run_batch(input_path: str, output_path: str):
+    from project.pipeline.rag import RAGPipeline
+    from project.pipeline.batch import BatchRunner
+    
+    logger.info(f"Starting batch run: {input_path} -> {output_path}")
+    pipeline = RAGPipeline()
+    pipeline.setup(use_attention_paper=True)
+    
+    stats = BatchRunner(pipeline).run(input_path, output_path)
+    print(
+        f"Answered: {stats['answered']}, failed: {stats['failed']}, "
+        f"skipped: {stats['skipped']}, invalid: {stats['invalid']}"
+    )
+
+
+def profile_startup(module: str):
+    from project.utils.import_profiler import check_import_budget, format_report
+    
+    report = check_import_budget(module)
+    print(format_report(report))
+    if not report["ok"]:
+        sys.exit(1)
+
+
+def profile_queries(num_queries: int):
+    import time
+    from project.pipeline.agents import AgentWorkflow
+    from project.utils import profiling
+    
+    agent = AgentWorkflow()
+    agent.setup(use_attention_paper=True)
+    
+    logger.info(f"Profiling {num_queries} queries")
+    with profiling.capture() as profile:
+        for i in range(num_queries):
+            agent.run(DEMO_QUESTIONS[i % len(DEMO_QUESTIONS)])
+    
+    output_dir = profiling.PROFILING_CONFIG.get('output_dir', 'logs/profiles')
+    paths = profile.save(output_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}")
+    summary = profile.summary()
+    
+    print(f"\n{summary['samples']} samples over {num_queries} queries\n")
+    print(f"{'share':>7}  stage")
+    for stage_path, share in summary["stage_share"].items():
+        print(f"{share:>7.1%}  {stage_path}")
+    print(f"\n{profile.allocation_report()}\n")
+    print(f"Collapsed stacks: {paths['collapsed']} (render with flamegraph.pl or speedscope)")
+    print(f"Allocation report: {paths['allocations']}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Corrective RAG pipeline")
+    parser.add_argument("--batch", metavar="INPUT", help="JSONL file of questions to answer offline")
+    parser.add_argument("--output", default="answers.jsonl", help="JSONL output file for --batch")
+    parser.add_argument(
+        "--profile-imports",
+        nargs="?",
+        const="app",
+        metavar="MODULE",
+        help="Report per-module import time for MODULE (default: app) and check the startup budget"
+    )
+    parser.add_argument(
+        "--profile",
+        type=int,
+        metavar="N",
+        help="Run N queries under the stage profiler and write a collapsed-stack file and allocation report"
+    )
+    args = parser.parse_args()
+    
+    if args.profile_imports:
+        profile_startup(args.profile_imports)
+        return
+    
     setup_langsmith()
+    
+    if args.profile:
+        profile_queries(args.profile)
+        return
+    
+    if args.batch:
+        run_batch(args.batch, args.output)
+        return
+    
     logger.info("Starting RAG application...")
     
+    from project.pipeline.agents import AgentWorkflow
     agent = AgentWorkflow()
     
     logger.info("Setting up pipeline with Attention Is All You Need paper...")
@@ -32,17 +121,11 @@ def main():
     agent.save_graph("workflow.png")
     logger.info("Workflow graph saved")
     
-    questions = [
-        "What is the attention mechanism in transformers?",
-        "Explain the multi-head attention.",
-        "What are the advantages of the transformer architecture?"
-    ]
-    
     print("\n" + "="*80)
     print("RAG PIPELINE WITH CORRECTIVE RAG (CRAG)")
     print("="*80 + "\n")
     
-    for i, question in enumerate(questions, 1):
+    for i, question in enumerate(DEMO_QUESTIONS, 1):
         print(f"\n{'='*80}")
         print(f"Question {i}: {question}")
         print(f"{'='*80}\n")
@@ -1,21 +1,144 @@
 import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
 import logging
+import contextvars
+from contextlib import contextmanager
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Iterator, Optional
+from project.utils.config_loader import load_config
 
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(LOG_DIR, f"{datetime.now().strftime('%Y_%m_%d')}.log")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s] %(levelname)s - %(name)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+LOG_FORMAT = "[%(asctime)s] %(levelname)s - %(name)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+_stage_timings: contextvars.ContextVar = contextvars.ContextVar("stage_timings", default=None)
+
+# Structured fields callers may pass through `extra=` to land in the JSON record
+EXTRA_FIELDS = ("stage_timings", "duration_ms", "status_code", "path", "profile")
+
+
+class ContextFilter(logging.Filter):
+    """Copies request context onto the record while still on the calling thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        return json.dumps(payload, default=str)
+
+
+class RequestFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{message} [request_id={request_id}]" if request_id else message
+
+
+def _configure_logging() -> QueueListener:
+    log_config = load_config().get('logging', {})
+    level = getattr(logging, str(log_config.get('level', 'INFO')).upper(), logging.INFO)
+
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=log_config.get('max_bytes', 10 * 1024 * 1024),
+        backupCount=log_config.get('backup_count', 5),
+        encoding='utf-8'
+    )
+    if log_config.get('json', True):
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(RequestFormatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(RequestFormatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+
+    # Request threads only enqueue records; a listener thread does the I/O
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(DebugSamplingFilter(log_config.get('debug_sample_rate', 1.0)))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+_listener = _configure_logging()
+
 
 def get_logger(name: str) -> logging.Logger:
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    request_id = request_id or uuid.uuid4().hex[:12]
+    id_token = _request_id.set(request_id)
+    timings_token = _stage_timings.set({})
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(id_token)
+        _stage_timings.reset(timings_token)
+
+
+@contextmanager
+def log_stage(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _stage_timings.get()
+        if timings is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed_ms, 1)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def get_stage_timings() -> Dict[str, float]:
+    return dict(_stage_timings.get() or {})
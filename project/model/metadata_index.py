@@ -0,0 +1,209 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from pydantic import ConfigDict, PrivateAttr
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
+from langchain_core.structured_query import Comparator, Comparison, Operator, StructuredQuery
+from project.logger.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _coerce(value: Any, like: Any) -> Any:
+    # LLM-built filters often quote numbers ("3" for page 3)
+    if isinstance(like, (int, float)) and not isinstance(like, bool) and isinstance(value, str):
+        try:
+            return type(like)(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _compare(comparator: Comparator, actual: Any, expected: Any) -> bool:
+    if actual is None:
+        return comparator in (Comparator.NE, Comparator.NIN)
+    try:
+        if comparator == Comparator.EQ:
+            return actual == _coerce(expected, actual)
+        if comparator == Comparator.NE:
+            return actual != _coerce(expected, actual)
+        if comparator == Comparator.GT:
+            return actual > _coerce(expected, actual)
+        if comparator == Comparator.GTE:
+            return actual >= _coerce(expected, actual)
+        if comparator == Comparator.LT:
+            return actual < _coerce(expected, actual)
+        if comparator == Comparator.LTE:
+            return actual <= _coerce(expected, actual)
+        if comparator in (Comparator.CONTAIN, Comparator.LIKE):
+            return str(expected).lower() in str(actual).lower()
+        if comparator in (Comparator.IN, Comparator.NIN):
+            values = expected if isinstance(expected, (list, tuple, set)) else [expected]
+            found = any(actual == _coerce(value, actual) for value in values)
+            return found if comparator == Comparator.IN else not found
+    except TypeError:
+        return False
+    return False
+
+
+def matches(filter: Any, metadata: Dict[str, Any]) -> bool:
+    if isinstance(filter, Comparison):
+        return _compare(filter.comparator, metadata.get(filter.attribute), filter.value)
+    if filter.operator == Operator.AND:
+        return all(matches(argument, metadata) for argument in filter.arguments)
+    if filter.operator == Operator.OR:
+        return any(matches(argument, metadata) for argument in filter.arguments)
+    return not matches(filter.arguments[0], metadata)
+
+
+class MetadataIndex:
+    """Inverted lists from metadata values to FAISS index positions.
+
+    Resolves a self-query filter to the exact set of matching chunk positions so
+    vector search can be restricted to them up front instead of over-fetching and
+    post-filtering.
+    """
+
+    def __init__(self, fields: Sequence[str], ntotal: int):
+        self.fields = list(fields)
+        self.ntotal = ntotal
+        self.postings: Dict[str, Dict[Any, np.ndarray]] = {field: {} for field in self.fields}
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: Any, fields: Sequence[str]) -> "MetadataIndex":
+        lists: Dict[str, Dict[Any, List[int]]] = {field: {} for field in fields}
+        for position, doc_id in vectorstore.index_to_docstore_id.items():
+            metadata = vectorstore.docstore.search(doc_id).metadata
+            for field in fields:
+                value = metadata.get(field)
+                if value is not None:
+                    lists[field].setdefault(value, []).append(position)
+
+        index = cls(fields, vectorstore.index.ntotal)
+        for field, values in lists.items():
+            index.postings[field] = {value: np.array(ids, dtype=np.int64) for value, ids in values.items()}
+        logger.info(f"Metadata index built over {index.ntotal} chunks for fields {index.fields}")
+        return index
+
+    def _all(self) -> np.ndarray:
+        return np.arange(self.ntotal, dtype=np.int64)
+
+    def _union(self, arrays: List[np.ndarray]) -> np.ndarray:
+        if not arrays:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(arrays))
+
+    def select(self, filter: Any) -> Optional[np.ndarray]:
+        """Sorted positions matching `filter`, or None if it uses an unindexed field."""
+        if isinstance(filter, Comparison):
+            postings = self.postings.get(filter.attribute)
+            if postings is None:
+                return None
+            selected = self._union([
+                ids for value, ids in postings.items()
+                if _compare(filter.comparator, value, filter.value)
+            ])
+            if filter.comparator in (Comparator.NE, Comparator.NIN):
+                # Chunks without the field also satisfy a negative comparison
+                present = self._union(list(postings.values()))
+                selected = np.union1d(selected, np.setdiff1d(self._all(), present))
+            return selected
+
+        selections = [self.select(argument) for argument in filter.arguments]
+        if any(selection is None for selection in selections):
+            return None
+        if filter.operator == Operator.AND:
+            result = selections[0]
+            for selection in selections[1:]:
+                result = np.intersect1d(result, selection)
+            return result
+        if filter.operator == Operator.OR:
+            return self._union(selections)
+        return np.setdiff1d(self._all(), selections[0])
+
+
+def search_positions(vectorstore: Any, query_vector: List[float], k: int, positions: np.ndarray) -> List[Document]:
+    if len(positions) == 0:
+        return []
+
+    vector = np.asarray([query_vector], dtype=np.float32)
+    index = vectorstore.index
+    if hasattr(index, 'search_restricted'):
+        _, labels = index.search_restricted(vector, k, positions)
+    else:
+        import faiss
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(positions))
+        _, labels = index.search(vector, k, params=params)
+
+    return [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(position)])
+        for position in labels[0] if position != -1
+    ]
+
+
+class IndexedSelfQueryRetriever(BaseRetriever):
+    """Self-query retriever that caches query translation and pre-filters by metadata.
+
+    The LLM translation of a question into a structured query is cached, and its
+    filter is resolved against a MetadataIndex so a filtered query costs a single
+    restricted vector search.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    query_constructor: Runnable
+    vectorstore: Any
+    metadata_index: MetadataIndex
+    k: int = 3
+    fetch_k: int = 20
+    cache_size: int = 1024
+
+    _cache: "OrderedDict[str, StructuredQuery]" = PrivateAttr(default_factory=OrderedDict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def structured_query(self, query: str, run_manager: Optional[CallbackManagerForRetrieverRun] = None) -> StructuredQuery:
+        key = " ".join(query.lower().split())
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        config = {"callbacks": run_manager.get_child()} if run_manager else None
+        structured = self.query_constructor.invoke({"query": query}, config=config)
+
+        with self._lock:
+            self._cache[key] = structured
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return structured
+
+    def _embed_query(self, text: str) -> List[float]:
+        embedding_function = self.vectorstore.embedding_function
+        if hasattr(embedding_function, 'embed_query'):
+            return embedding_function.embed_query(text)
+        return embedding_function(text)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        structured = self.structured_query(query, run_manager)
+        search_query = structured.query.strip() or query
+        k = structured.limit or self.k
+
+        if structured.filter is None:
+            return self.vectorstore.similarity_search(search_query, k=k)
+
+        positions = self.metadata_index.select(structured.filter)
+        if positions is None:
+            logger.debug("Filter uses unindexed fields, falling back to post-filtering")
+            return self.vectorstore.similarity_search(
+                search_query,
+                k=k,
+                fetch_k=self.fetch_k,
+                filter=lambda metadata: matches(structured.filter, metadata)
+            )
+
+        return search_positions(self.vectorstore, self._embed_query(search_query), k, positions)
@@ -0,0 +1,327 @@
+import os
+import weakref
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Set, Tuple
+import numpy as np
+from project.logger.logging import get_logger
+
+logger = get_logger(__name__)
+
+QUANTIZATION_MODES = ("int8", "binary")
+
+# Number of set bits for every byte value, used for Hamming distances on binary codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Rows decoded at a time during int8 scans, bounding the transient float buffer
+_SCAN_CHUNK = 65536
+
+
+# Storage directories already swept for orphaned files by this process
+_swept_dirs: Set[str] = set()
+_sweep_lock = threading.Lock()
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove vector file {path}: {str(e)}")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_orphaned_files(storage_dir: str) -> int:
+    """Deletes float files left by processes that died without cleaning up (SIGKILL, OOM).
+
+    Files are named `<name>.<pid>.<random>.f32`; a file is removed only when its
+    pid is no longer running. Only done on POSIX, where signal 0 probes a pid.
+    """
+    if os.name != "posix" or not os.path.isdir(storage_dir):
+        return 0
+    removed = 0
+    for entry in os.scandir(storage_dir):
+        parts = entry.name[:-len(".f32")].rsplit(".", 2) if entry.name.endswith(".f32") else []
+        if len(parts) != 3 or not parts[1].isdigit():
+            continue
+        pid = int(parts[1])
+        if pid != os.getpid() and not _pid_alive(pid):
+            _remove_file(entry.path)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} orphaned vector files from {storage_dir}")
+    return removed
+
+
+class QuantizedIndex:
+    """Compressed L2 index that keeps only quantized codes in memory.
+
+    First-stage search scans int8 scalar codes (4x smaller than float32) or sign
+    bits (32x smaller); a shortlist of `k * rescore_factor` candidates is then
+    re-scored exactly against the float vectors, which live in a memory-mapped
+    file on disk. Exposes the subset of the FAISS index API that the LangChain
+    FAISS vector store uses (add, search, reconstruct, ntotal, d).
+
+    Each index writes its own uniquely named file under `storage_dir`, so a
+    rebuilt index or another worker process never truncates a file that a live
+    memmap still reads. The file is removed by `close()`, or when the index is
+    garbage collected or the process exits.
+    """
+
+    def __init__(self, d: int, mode: str, storage_dir: str, name: str = "index", rescore_factor: int = 4):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.d = d
+        self.mode = mode
+        self.rescore_factor = rescore_factor
+        Path(storage_dir).mkdir(parents=True, exist_ok=True)
+        with _sweep_lock:
+            if os.path.abspath(storage_dir) not in _swept_dirs:
+                sweep_orphaned_files(storage_dir)
+                _swept_dirs.add(os.path.abspath(storage_dir))
+        fd, path = tempfile.mkstemp(prefix=f"{name}.{os.getpid()}.", suffix=".f32", dir=storage_dir)
+        os.close(fd)
+        self.storage_path = Path(path)
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+        self._stored = 0
+        self.ntotal = 0
+        self.is_trained = True
+        code_size = d if mode == "int8" else (d + 7) // 8
+        self.codes = np.empty((0, code_size), dtype=np.uint8)
+        self.norms = np.empty(0, dtype=np.float32)
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self._vectors: Optional[np.memmap] = None
+
+    def _encode(self, x: np.ndarray) -> np.ndarray:
+        if self.mode == "binary":
+            return np.packbits(x > self.offset, axis=1)
+        return np.clip(np.rint((x - self.offset) / self.scale), 0, 255).astype(np.uint8)
+
+    def _decoded_norms(self, codes: np.ndarray) -> np.ndarray:
+        decoded = codes.astype(np.float32) * self.scale + self.offset
+        return (decoded ** 2).sum(axis=1)
+
+    @property
+    def vectors(self) -> np.memmap:
+        if self._vectors is None:
+            self._vectors = np.memmap(self.storage_path, dtype=np.float32, mode='r', shape=(self._stored, self.d))
+        return self._vectors
+
+    def _append_vectors(self, x: np.ndarray):
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        with open(self.storage_path, 'ab') as file:
+            file.write(x.tobytes())
+        self._stored += len(x)
+        self._vectors = None
+
+    def _calibrate(self, start: int):
+        # Calibrated on the first batch: per-dimension range for int8 (later adds
+        # are clipped to it), per-dimension mean as the sign threshold for binary
+        low, high, total = None, None, np.zeros(self.d, dtype=np.float64)
+        for chunk_start in range(start, self._stored, _SCAN_CHUNK):
+            chunk = np.asarray(self.vectors[chunk_start:chunk_start + _SCAN_CHUNK])
+            low = chunk.min(axis=0) if low is None else np.minimum(low, chunk.min(axis=0))
+            high = chunk.max(axis=0) if high is None else np.maximum(high, chunk.max(axis=0))
+            total += chunk.sum(axis=0)
+        if self.mode == "int8":
+            self.offset = low
+            self.scale = np.maximum(high - low, 1e-6) / 255.0
+        else:
+            self.offset = (total / (self._stored - start)).astype(np.float32)
+
+    def _index_stored(self):
+        """Encodes rows appended to the float file since the last call, a chunk at a time."""
+        start = self.ntotal
+        if start == self._stored:
+            return
+        if self.offset is None:
+            self._calibrate(start)
+
+        codes, norms = [self.codes], [self.norms]
+        for chunk_start in range(start, self._stored, _SCAN_CHUNK):
+            chunk_codes = self._encode(np.asarray(self.vectors[chunk_start:chunk_start + _SCAN_CHUNK]))
+            codes.append(chunk_codes)
+            if self.mode == "int8":
+                norms.append(self._decoded_norms(chunk_codes))
+        self.codes = np.concatenate(codes)
+        self.norms = np.concatenate(norms)
+        self.ntotal = self._stored
+
+    def add(self, x: np.ndarray):
+        self._append_vectors(x)
+        self._index_stored()
+
+    def close(self):
+        """Deletes the float file. Memmaps already handed out stay readable on POSIX."""
+        self._finalizer()
+
+    def _approximate_distances(self, query: np.ndarray, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self.codes if ids is None else self.codes[ids]
+        if self.mode == "binary":
+            query_code = np.packbits(query > self.offset)
+            return _POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1).astype(np.float32)
+
+        # ||q - x||^2 up to the constant ||q||^2, with x = codes * scale + offset
+        norms = self.norms if ids is None else self.norms[ids]
+        scaled_query = query * self.scale
+        dots = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _SCAN_CHUNK):
+            chunk = codes[start:start + _SCAN_CHUNK]
+            dots[start:start + len(chunk)] = chunk.astype(np.float32) @ scaled_query
+        dots += float(query @ self.offset)
+        return norms - 2 * dots
+
+    def _search_one(self, query: np.ndarray, k: int, ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        candidates = np.arange(self.ntotal) if ids is None else ids
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        approximate = self._approximate_distances(query, ids)
+        shortlist_size = min(len(candidates), k * self.rescore_factor)
+        shortlist = np.argpartition(approximate, shortlist_size - 1)[:shortlist_size]
+        shortlist_ids = np.sort(candidates[shortlist])
+
+        exact = ((self.vectors[shortlist_ids] - query) ** 2).sum(axis=1)
+        order = np.argsort(exact)[:k]
+        return exact[order].astype(np.float32), shortlist_ids[order].astype(np.int64)
+
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        x = np.atleast_2d(np.asarray(x, dtype=np.float32))
+        distances = np.full((len(x), k), np.inf, dtype=np.float32)
+        labels = np.full((len(x), k), -1, dtype=np.int64)
+        for row, query in enumerate(x):
+            found_distances, found_labels = self._search_one(query, k)
+            distances[row, :len(found_labels)] = found_distances
+            labels[row, :len(found_labels)] = found_labels
+        return distances, labels
+
+    def search_restricted(self, x: np.ndarray, k: int, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Search restricted to the given positions, e.g. from a metadata pre-filter."""
+        x = np.atleast_2d(np.asarray(x, dtype=np.float32))
+        ids = np.asarray(ids, dtype=np.int64)
+        distances = np.full((len(x), k), np.inf, dtype=np.float32)
+        labels = np.full((len(x), k), -1, dtype=np.int64)
+        for row, query in enumerate(x):
+            found_distances, found_labels = self._search_one(query, k, ids)
+            distances[row, :len(found_labels)] = found_distances
+            labels[row, :len(found_labels)] = found_labels
+        return distances, labels
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self.vectors[key])
+
+    def reconstruct_n(self, start: int, n: int) -> np.ndarray:
+        return np.array(self.vectors[start:start + n])
+
+    def memory_bytes(self) -> int:
+        size = self.codes.nbytes + self.norms.nbytes
+        if self.offset is not None:
+            size += self.offset.nbytes
+        if self.scale is not None:
+            size += self.scale.nbytes
+        return size
+
+    def _exact_top_k(self, queries: np.ndarray, k: int) -> np.ndarray:
+        # Scans the float file a chunk at a time, keeping a running top-k per query;
+        # labels come back ordered nearest first
+        best_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        best_labels = np.full((len(queries), k), -1, dtype=np.int64)
+        for start in range(0, self.ntotal, _SCAN_CHUNK):
+            chunk = np.asarray(self.vectors[start:start + _SCAN_CHUNK])
+            # ||q - x||^2 up to the per-query constant ||q||^2
+            distances = (chunk ** 2).sum(axis=1) - 2 * (queries @ chunk.T)
+            labels = np.broadcast_to(np.arange(start, start + len(chunk)), distances.shape)
+            candidate_distances = np.concatenate([best_distances, distances], axis=1)
+            candidate_labels = np.concatenate([best_labels, labels], axis=1)
+            keep = np.argpartition(candidate_distances, k - 1, axis=1)[:, :k]
+            best_distances = np.take_along_axis(candidate_distances, keep, axis=1)
+            best_labels = np.take_along_axis(candidate_labels, keep, axis=1)
+        order = np.argsort(best_distances, axis=1)
+        return np.take_along_axis(best_labels, order, axis=1)
+
+    def measure_recall(self, queries: np.ndarray, k: int, exclude: Optional[np.ndarray] = None) -> float:
+        """Fraction of the exact float top-k that the quantized search also returns.
+
+        `exclude` gives one position per query to leave out of both result lists,
+        e.g. the chunk a query was derived from, so its trivial match does not
+        inflate recall.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        extra = 0 if exclude is None else 1
+        k = min(k, self.ntotal - extra)
+        if k <= 0:
+            return 1.0
+        _, approximate_labels = self.search(queries, k + extra)
+        exact_labels = self._exact_top_k(queries, k + extra)
+
+        hits = 0
+        for row, (exact, approximate) in enumerate(zip(exact_labels, approximate_labels)):
+            skip = None if exclude is None else exclude[row]
+            exact = [label for label in exact.tolist() if label != skip][:k]
+            approximate = [label for label in approximate.tolist() if label != skip][:k]
+            hits += len(set(exact) & set(approximate))
+        return hits / (len(queries) * k)
+
+
+def _recall_queries(vectorstore, positions: np.ndarray) -> np.ndarray:
+    """Query-side embeddings of the chunks at the given index positions."""
+    texts = [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[position]).page_content
+        for position in positions.tolist()
+    ]
+    queries = np.array([vectorstore._embed_query(text) for text in texts], dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    return queries
+
+
+def quantize_vectorstore(
+    vectorstore,
+    mode: str,
+    storage_dir: str,
+    name: str = "index",
+    rescore_factor: int = 4,
+    recall_sample: int = 100,
+    recall_k: int = 10
+):
+    """Swaps a FAISS vector store's flat index for a QuantizedIndex in place.
+
+    Vectors are streamed from the flat index to the float file a chunk at a time
+    and the flat index is released before encoding, so the float matrix is never
+    held in memory twice.
+    """
+    flat_index = vectorstore.index
+    quantized = QuantizedIndex(flat_index.d, mode, storage_dir, name, rescore_factor)
+    for start in range(0, flat_index.ntotal, _SCAN_CHUNK):
+        quantized._append_vectors(flat_index.reconstruct_n(start, min(_SCAN_CHUNK, flat_index.ntotal - start)))
+    vectorstore.index = quantized
+    del flat_index
+    quantized._index_stored()
+
+    float_bytes = quantized.ntotal * quantized.d * 4
+    message = (
+        f"Quantized {quantized.ntotal} vectors ({mode}): "
+        f"{float_bytes / 1e6:.2f} MB -> {quantized.memory_bytes() / 1e6:.2f} MB resident "
+        f"({float_bytes / max(quantized.memory_bytes(), 1):.1f}x smaller)"
+    )
+    if recall_sample and quantized.ntotal > 1:
+        # Sampled chunks are embedded as queries and excluded from their own results,
+        # since a stored vector searched for itself is always found
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(quantized.ntotal, size=min(recall_sample, quantized.ntotal), replace=False))
+        recall = quantized.measure_recall(_recall_queries(vectorstore, sample), recall_k, exclude=sample)
+        message += f", recall@{min(recall_k, quantized.ntotal - 1)}={recall:.3f}"
+    logger.info(message)
+    return vectorstore
@@ -1,6 +1,5 @@
 from typing import List
 from langchain.schema import Document
-from flashrank.Ranker import Ranker, RerankRequest
 from project.utils.config_loader import load_config
 from project.logger.logging import get_logger
 
@@ -16,6 +15,7 @@ class DocumentReranker:
         cache_dir = reranker_config.get('cache_dir')
         self.top_k = reranker_config.get('top_k', 3)
         
+        from flashrank.Ranker import Ranker
         if cache_dir:
             self.ranker = Ranker(model_name=model_name, cache_dir=cache_dir)
         else:
@@ -46,16 +46,31 @@ class DocumentReranker:
             for i, doc in enumerate(documents)
         ]
         
+        from flashrank.Ranker import RerankRequest
         rerank_request = RerankRequest(query=query, passages=passages)
         
         results = self.ranker.rerank(rerank_request)
         
+        # Scored copies: the inputs are usually the docstore's own Document objects,
+        # shared by every concurrent request
         reranked_docs = []
         for result in results[:top_k]:
-            doc_idx = result["id"]
-            original_doc = documents[doc_idx]
-            original_doc.metadata["rerank_score"] = result["score"]
-            reranked_docs.append(original_doc)
+            original_doc = documents[result["id"]]
+            reranked_docs.append(Document(
+                page_content=original_doc.page_content,
+                metadata={**original_doc.metadata, "rerank_score": result["score"]}
+            ))
         
-        logger.info(f"Reranked {len(documents)} documents, returning top {len(reranked_docs)}")
+        logger.debug(f"Reranked {len(documents)} documents, returning top {len(reranked_docs)}")
         return reranked_docs
+    
+    def rerank_batch(
+        self,
+        queries: List[str],
+        documents_list: List[List[Document]],
+        top_k: int = None
+    ) -> List[List[Document]]:
+        return [
+            self.rerank(query, documents, top_k)
+            for query, documents in zip(queries, documents_list)
+        ]
@@ -1,12 +1,14 @@
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
+import numpy as np
 from langchain.schema import Document
-from langchain_community.vectorstores import FAISS
-from langchain.chains.query_constructor.base import AttributeInfo
-from langchain.retrievers.self_query.base import SelfQueryRetriever
 from project.utils.model_loader import ModelLoader
 from project.utils.config_loader import load_config
 from project.logger.logging import get_logger
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+    from langchain.chains.query_constructor.base import AttributeInfo
+
 logger = get_logger(__name__)
 
 class DocumentRetriever:
@@ -14,21 +16,84 @@ class DocumentRetriever:
         self.config = load_config(config_path)
         self.model_loader = ModelLoader(config_path)
         self.embeddings = self.model_loader.load_embeddings()
-        self.llm = self.model_loader.load_llm()
+        self.llm = self.model_loader.load_llm(priority="self_query")
         self.vectorstore = None
         self.retriever = None
+        self.parent_store: Dict[str, Document] = {}
         logger.info("DocumentRetriever initialized")
     
-    def create_vectorstore(self, documents: List[Document]) -> FAISS:
-        self.vectorstore = FAISS.from_documents(documents, self.embeddings)
+    def build_vectorstore(self, documents: List[Document]) -> "FAISS":
+        from langchain_community.vectorstores import FAISS
+        vectorstore = FAISS.from_documents(documents, self.embeddings)
         logger.info(f"Vector store created with {len(documents)} documents")
+        return vectorstore
+    
+    def load_vectorstore(self, path: str) -> "FAISS":
+        from langchain_community.vectorstores import FAISS
+        vectorstore = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+        logger.info(f"Vector store loaded from {path}")
+        return vectorstore
+    
+    def quantize(self, vectorstore: "FAISS", name: str = "default") -> "FAISS":
+        retriever_config = self.config.get('retriever', {})
+        quantization_config = retriever_config.get('quantization') or {}
+        mode = quantization_config.get('mode')
+        if not mode:
+            return vectorstore
+        
+        from project.model.quantized_index import quantize_vectorstore
+        return quantize_vectorstore(
+            vectorstore,
+            mode=mode,
+            storage_dir=quantization_config.get('storage_dir', 'vector_store'),
+            name=name,
+            rescore_factor=quantization_config.get('rescore_factor', 4),
+            recall_sample=quantization_config.get('recall_sample', 100),
+            recall_k=retriever_config.get('top_k', 3) * 2
+        )
+    
+    def create_vectorstore(self, documents: List[Document]) -> "FAISS":
+        self.vectorstore = self.quantize(self.build_vectorstore(documents))
         return self.vectorstore
     
+    def create_hierarchical_vectorstore(
+        self,
+        parents: List[Document],
+        children: List[Document]
+    ) -> "FAISS":
+        self.parent_store = {parent.metadata["parent_id"]: parent for parent in parents}
+        logger.info(f"Parent store holds {len(self.parent_store)} sections")
+        return self.create_vectorstore(children)
+    
+    def expand_to_parents(self, children: List[Document], top_k: int) -> List[Document]:
+        parents = []
+        seen = set()
+        for child in children:
+            if len(parents) == top_k:
+                break
+            parent_id = child.metadata.get("parent_id")
+            if parent_id in seen:
+                # A sibling already brought in this parent; keep the better-ranked one
+                continue
+            parent = self.parent_store.get(parent_id)
+            if parent is None:
+                parents.append(child)
+                continue
+            seen.add(parent_id)
+            metadata = dict(parent.metadata)
+            if "rerank_score" in child.metadata:
+                metadata["rerank_score"] = child.metadata["rerank_score"]
+            parents.append(Document(page_content=parent.page_content, metadata=metadata))
+        return parents
+    
     def setup_self_query_retriever(
         self,
         document_content_description: str = "Research papers and technical documents",
-        metadata_field_info: Optional[List[AttributeInfo]] = None
+        metadata_field_info: Optional[List["AttributeInfo"]] = None
     ):
+        from langchain.chains.query_constructor.base import AttributeInfo, load_query_constructor_runnable
+        from project.model.metadata_index import IndexedSelfQueryRetriever, MetadataIndex
+        
         if self.vectorstore is None:
             raise ValueError("Vector store not initialized. Call create_vectorstore first.")
         
@@ -47,17 +112,27 @@ class DocumentRetriever:
             ]
         
         retriever_config = self.config.get('retriever', {})
+        top_k = retriever_config.get('top_k', 3)
         
-        self.retriever = SelfQueryRetriever.from_llm(
-            llm=self.llm,
-            vectorstore=self.vectorstore,
-            document_contents=document_content_description,
-            metadata_field_info=metadata_field_info,
-            search_kwargs={
-                'k': retriever_config.get('top_k', 3)
-            },
+        query_constructor = load_query_constructor_runnable(
+            self.llm,
+            document_content_description,
+            metadata_field_info,
             enable_limit=True
         )
+        metadata_index = MetadataIndex.from_vectorstore(
+            self.vectorstore,
+            [field.name for field in metadata_field_info]
+        )
+        
+        self.retriever = IndexedSelfQueryRetriever(
+            query_constructor=query_constructor,
+            vectorstore=self.vectorstore,
+            metadata_index=metadata_index,
+            k=top_k,
+            fetch_k=top_k * 10,
+            cache_size=retriever_config.get('self_query_cache_size', 1024)
+        )
         
         logger.info("Self-query retriever configured")
         return self.retriever
@@ -67,27 +142,62 @@ class DocumentRetriever:
             raise ValueError("Retriever not initialized. Call setup_self_query_retriever first.")
         
         documents = self.retriever.invoke(query)
-        logger.info(f"Retrieved {len(documents)} documents for query")
+        logger.debug(f"Retrieved {len(documents)} documents for query")
         return documents
     
-    def get_base_retriever(self):
+    def get_base_retriever(self, k: int = None):
         if self.vectorstore is None:
             raise ValueError("Vector store not initialized.")
         
+        self.retriever = self.build_retriever(self.vectorstore, k)
+        search_type = self.config.get('retriever', {}).get('search_type', 'similarity')
+        logger.info(f"Base retriever configured with {search_type} search")
+        return self.retriever
+    
+    def build_retriever(self, vectorstore: "FAISS", k: int = None):
         retriever_config = self.config.get('retriever', {})
         search_type = retriever_config.get('search_type', 'similarity')
-        top_k = retriever_config.get('top_k', 3)
+        top_k = k or retriever_config.get('top_k', 3)
         
         if search_type == 'mmr':
-            self.retriever = self.vectorstore.as_retriever(
+            retriever = vectorstore.as_retriever(
                 search_type='mmr',
                 search_kwargs={'k': top_k, 'fetch_k': top_k * 2}
             )
         else:
-            self.retriever = self.vectorstore.as_retriever(
+            retriever = vectorstore.as_retriever(
                 search_type='similarity',
                 search_kwargs={'k': top_k}
             )
+        return retriever
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        model = getattr(self.embeddings, 'model', None)
+        if model is not None and hasattr(model, 'query_embed'):
+            vectors = list(model.query_embed(queries, batch_size=self.embeddings.batch_size))
+        else:
+            vectors = [self.embeddings.embed_query(query) for query in queries]
+        return np.asarray(vectors, dtype=np.float32)
+    
+    def batch_search(self, queries: List[str], k: int = None) -> List[List[Document]]:
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized.")
         
-        logger.info(f"Base retriever configured with {search_type} search")
-        return self.retriever
+        if k is None:
+            k = self.config.get('retriever', {}).get('top_k', 3)
+        
+        vectors = self.embed_queries(queries)
+        _, indices = self.vectorstore.index.search(vectors, k)
+        
+        results = []
+        for row in indices:
+            documents = []
+            for i in row:
+                if i == -1:
+                    continue
+                doc_id = self.vectorstore.index_to_docstore_id[int(i)]
+                documents.append(self.vectorstore.docstore.search(doc_id))
+            results.append(documents)
+        
+        logger.info(f"Batch search completed for {len(queries)} queries")
+        return results
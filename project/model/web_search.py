@@ -0,0 +1,218 @@
+import os
+import time
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+from langchain.schema import Document
+from project.utils.config_loader import load_config
+from project.logger.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class WebSearchProvider(ABC):
+    """Interface for web search backends. Returns dicts with 'content' and optional 'url'."""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        ...
+
+
+class TavilySearchProvider(WebSearchProvider):
+    """Calls the Tavily search API directly so each request carries a timeout.
+
+    The LangChain Tavily tool posts without one, which lets a hung request hold
+    a search worker indefinitely after the caller has given up on it.
+    """
+
+    name = "tavily"
+
+    def __init__(self, timeout: float = 5.0, search_depth: str = "advanced"):
+        from langchain_community.utilities.tavily_search import TAVILY_API_URL, TavilySearchAPIWrapper
+        self.api_wrapper = TavilySearchAPIWrapper()
+        self.url = f"{TAVILY_API_URL}/search"
+        self.timeout = timeout
+        self.search_depth = search_depth
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        import requests
+        response = requests.post(
+            self.url,
+            json={
+                "api_key": self.api_wrapper.tavily_api_key.get_secret_value(),
+                "query": query,
+                "max_results": max_results,
+                "search_depth": self.search_depth,
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return self.api_wrapper.clean_results(response.json().get("results", []))[:max_results]
+
+
+class StaticSearchProvider(WebSearchProvider):
+    """Offline provider returning canned results, for tests and local runs."""
+
+    name = "static"
+
+    def __init__(self, results: Optional[List[Dict[str, Any]]] = None, delay: float = 0.0):
+        self.results = results or []
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.results[:max_results]
+
+
+class WebSearcher:
+    """Time-boxed web search with a TTL cache keyed by the (rewritten) query.
+
+    Searches run on a small thread pool so they can be started speculatively and
+    awaited later; concurrent requests for the same query share one in-flight call.
+    While every worker is still busy with a search past its deadline, new
+    searches are not queued behind them and return no results instead.
+    """
+
+    def __init__(self, provider: WebSearchProvider, config_path: str = None):
+        self.config = load_config(config_path)
+        search_config = self.config.get('web_search', {})
+        self.provider = provider
+        self.max_results = search_config.get('max_results', 3)
+        self.max_chars_per_result = search_config.get('max_chars_per_result', 1500)
+        self.timeout = search_config.get('timeout_seconds', 5.0)
+        self.cache_ttl = search_config.get('cache_ttl_seconds', 3600)
+        self.cache_size = search_config.get('cache_size', 256)
+        self.speculative_threshold = search_config.get('speculative_score_threshold')
+        self.max_workers = search_config.get('max_workers', 4)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="web-search")
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        # Start times of provider calls currently running, keyed by cache key
+        self._running: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        logger.info(f"WebSearcher initialized with provider: {provider.name}")
+
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _get_cached(self, key: str) -> Optional[List[Document]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, documents = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return documents
+
+    def _store(self, key: str, documents: List[Document]):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, documents)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._in_flight.pop(key, None)
+
+    def _to_documents(self, results: List[Dict[str, Any]]) -> List[Document]:
+        documents = []
+        for result in results:
+            content = result.get("content") if isinstance(result, dict) else None
+            if not content:
+                continue
+            documents.append(Document(
+                page_content=content[:self.max_chars_per_result],
+                metadata={"source": result.get("url", "web_search"), "provider": self.provider.name}
+            ))
+        return documents
+
+    def _run(self, key: str, query: str) -> List[Document]:
+        with self._lock:
+            self._running[key] = time.monotonic()
+        try:
+            documents = self._to_documents(self.provider.search(query, self.max_results))
+        except Exception:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            raise
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+        self._store(key, documents)
+        return documents
+
+    def _saturated(self) -> bool:
+        """True when every worker is running a search that has outlived its deadline."""
+        cutoff = time.monotonic() - self.timeout
+        overdue = sum(1 for started in self._running.values() if started < cutoff)
+        return overdue >= self.max_workers
+
+    def start(self, query: str) -> Future:
+        key = self._cache_key(query)
+        with self._lock:
+            cached = self._get_cached(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+            future = self._in_flight.get(key)
+            if future is None and self._saturated():
+                logger.warning("All web search workers are past their deadline, skipping search")
+                future = Future()
+                future.set_result([])
+                return future
+            if future is None:
+                context = contextvars.copy_context()
+                future = self.executor.submit(context.run, self._run, key, query)
+                self._in_flight[key] = future
+        return future
+
+    def search(self, query: str, timeout: float = None) -> List[Document]:
+        timeout = self.timeout if timeout is None else timeout
+        future = self.start(query)
+        try:
+            documents = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning(f"Web search exceeded {timeout}s deadline, continuing without results")
+            return []
+        except Exception as e:
+            logger.error(f"Web search failed: {str(e)}")
+            return []
+        logger.debug(f"Web search returned {len(documents)} documents")
+        return list(documents)
+
+    def should_speculate(self, documents: List[Document]) -> bool:
+        if self.speculative_threshold is None or not documents:
+            return False
+        scores = [d.metadata.get("rerank_score") for d in documents]
+        scores = [float(s) for s in scores if s is not None]
+        return bool(scores) and max(scores) < self.speculative_threshold
+
+
+def load_web_search_provider(config_path: str = None) -> Optional[WebSearchProvider]:
+    config = load_config(config_path)
+    search_config = config.get('web_search', {})
+    provider = search_config.get('provider', 'tavily')
+
+    if provider == 'tavily':
+        if not os.getenv("TAVILY_API_KEY"):
+            logger.warning("TAVILY_API_KEY not found, web search disabled")
+            return None
+        try:
+            return TavilySearchProvider(timeout=search_config.get('timeout_seconds', 5.0))
+        except Exception as e:
+            logger.warning(f"Could not initialize web search: {str(e)}")
+            return None
+    elif provider == 'static':
+        return StaticSearchProvider(results=search_config.get('static_results', []))
+    else:
+        raise ValueError(f"Unsupported web search provider: {provider}")
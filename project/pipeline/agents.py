@@ -1,14 +1,15 @@
-import os
-from typing import List, Literal
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Literal, Optional
 from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
-from langchain.schema import Document
 from langchain_core.output_parsers import StrOutputParser
-from langgraph.graph import END, StateGraph, START
 from project.pipeline.rag import RAGPipeline
+from project.model.web_search import WebSearcher, load_web_search_provider
 from project.utils.model_loader import ModelLoader
 from project.prompts.prompt_template import ROUTER_PROMPT, WEB_SEARCH_PROMPT
 from project.logger.logging import get_logger
+from project.utils.profiling import stage
 
 logger = get_logger(__name__)
 
@@ -22,6 +23,9 @@ class GraphState(TypedDict):
     generation: str
     web_search: str
     documents: List[str]
+    speculation: Any
+    collection: Optional[str]
+    degraded: bool
 
 
 class AgentWorkflow:
@@ -31,7 +35,8 @@ class AgentWorkflow:
         self.model_loader = ModelLoader(config_path)
         self.llm = self.model_loader.load_llm()
         self.rag_pipeline = RAGPipeline(config_path)
-        self.web_search_tool = None
+        self.web_searcher = None
+        self.rewrite_executor = None
         self._setup_web_search()
         self.workflow = None
         self.app = None
@@ -39,17 +44,16 @@ class AgentWorkflow:
         logger.info("AgentWorkflow initialized")
     
     def _setup_web_search(self):
-        tavily_key = os.getenv("TAVILY_API_KEY")
-        if tavily_key:
-            try:
-                from langchain_community.tools.tavily_search import TavilySearchResults
-                self.web_search_tool = TavilySearchResults(k=3)
-                logger.info("Web search tool initialized")
-            except Exception as e:
-                logger.warning(f"Could not initialize web search: {str(e)}")
-                self.web_search_tool = None
-        else:
-            logger.warning("TAVILY_API_KEY not found, web search disabled")
+        provider = load_web_search_provider(self.config_path)
+        if provider is not None:
+            self.web_searcher = WebSearcher(provider, self.config_path)
+            # Rewrites wait on the LLM gateway; keeping them off the search pool means
+            # queued rewrites can never starve the provider calls they feed
+            self.rewrite_executor = ThreadPoolExecutor(
+                max_workers=self.model_loader.config.get('web_search', {}).get('rewrite_workers', 2),
+                thread_name_prefix="speculative-rewrite"
+            )
+            logger.info("Web search tool initialized")
     
     def _setup_graders(self):
         grade_prompt = """You are a grader assessing relevance of a retrieved document to a user question.
@@ -62,7 +66,7 @@ User question: {question}
 Answer (yes or no):"""
         
         self.grade_prompt_text = grade_prompt
-        self.retrieval_grader = self.llm | StrOutputParser()
+        self.retrieval_grader = self.llm.with_priority("grading") | StrOutputParser()
         
         rewrite_prompt = """You are a question re-writer that converts an input question to a better version optimized for web search.
 Look at the input and try to reason about the underlying semantic intent/meaning.
@@ -73,7 +77,7 @@ Initial question: {question}
 Improved question:"""
         
         self.rewrite_prompt_text = rewrite_prompt
-        self.question_rewriter = self.llm | StrOutputParser()
+        self.question_rewriter = self.llm.with_priority("rewrite") | StrOutputParser()
     
     def setup(self, pdf_path: str = None, use_attention_paper: bool = True):
         self.rag_pipeline.setup(pdf_path=pdf_path, use_attention_paper=use_attention_paper)
@@ -83,7 +87,7 @@ Improved question:"""
     def retrieve(self, state: GraphState):
         logger.info("---RETRIEVE---")
         question = state["question"]
-        documents = self.rag_pipeline.retriever.invoke(question)
+        documents = self.rag_pipeline.get_retrieved_documents(question, state.get("collection"))
         return {"documents": documents, "question": question}
     
     def grade_documents(self, state: GraphState):
@@ -93,6 +97,12 @@ Improved question:"""
         
         filtered_docs = []
         web_search = "No"
+        speculation = None
+        
+        if self.web_searcher is not None and self.web_searcher.should_speculate(documents):
+            logger.info("---LOW RERANK SCORES, STARTING SPECULATIVE WEB SEARCH---")
+            context = contextvars.copy_context()
+            speculation = self.rewrite_executor.submit(context.run, self._rewrite_and_search, question)
         
         for d in documents:
             prompt_filled = self.grade_prompt_text.format(
@@ -103,20 +113,26 @@ Improved question:"""
             grade = score.strip().lower()
             
             if "yes" in grade:
-                logger.info("---GRADE: DOCUMENT RELEVANT---")
+                logger.debug("---GRADE: DOCUMENT RELEVANT---")
                 filtered_docs.append(d)
             else:
-                logger.info("---GRADE: DOCUMENT NOT RELEVANT---")
+                logger.debug("---GRADE: DOCUMENT NOT RELEVANT---")
                 web_search = "Yes"
         
-        return {"documents": filtered_docs, "question": question, "web_search": web_search}
+        return {
+            "documents": filtered_docs,
+            "question": question,
+            "web_search": web_search,
+            "speculation": speculation
+        }
     
     def generate(self, state: GraphState):
         logger.info("---GENERATE---")
         question = state["question"]
         documents = state["documents"]
         
-        generation = self.rag_pipeline.chain.invoke({"question": question})
+        # Answer from the graded and web-augmented documents rather than retrieving again
+        generation = self.rag_pipeline.generate(question, documents)
         return {"documents": documents, "question": question, "generation": generation}
     
     def transform_query(self, state: GraphState):
@@ -124,34 +140,49 @@ Improved question:"""
         question = state["question"]
         documents = state["documents"]
         
-        prompt_filled = self.rewrite_prompt_text.format(question=question)
-        better_question = self.question_rewriter.invoke(prompt_filled)
+        speculation = state.get("speculation")
+        better_question = None
+        if speculation is not None:
+            try:
+                better_question = speculation.result()
+                logger.info("Using speculatively rewritten question")
+            except Exception as e:
+                logger.warning(f"Speculative rewrite failed: {str(e)}")
+        
+        if better_question is None:
+            better_question = self._rewrite(question)
         
         return {"documents": documents, "question": better_question}
     
+    def _rewrite(self, question: str) -> str:
+        prompt_filled = self.rewrite_prompt_text.format(question=question)
+        return self.question_rewriter.invoke(prompt_filled).strip()
+    
+    def _rewrite_and_search(self, question: str) -> str:
+        better_question = self._rewrite(question)
+        self.web_searcher.start(better_question)
+        return better_question
+    
     def web_search(self, state: GraphState):
         logger.info("---WEB SEARCH---")
         question = state["question"]
         documents = state["documents"]
         
-        if self.web_search_tool is None:
+        if self.web_searcher is None:
             logger.warning("Web search tool not available, skipping")
             return {"documents": documents, "question": question}
         
-        try:
-            response = self.web_search_tool.invoke({"query": question})
-            
-            if not response:
-                logger.warning("No results from web search")
-                return {"documents": documents, "question": question}
-            
-            web_results = "\n".join([d["content"] for d in response if "content" in d])
-            web_doc = Document(page_content=web_results)
-            documents.append(web_doc)
-        except Exception as e:
-            logger.error(f"Web search failed: {str(e)}")
+        web_docs = self.web_searcher.search(question)
+        if not web_docs:
+            logger.warning("No results from web search")
         
-        return {"documents": documents, "question": question}
+        return {"documents": documents + web_docs, "question": question}
+    
+    def decide_after_retrieve(self, state: GraphState) -> Literal["grade_documents", "generate"]:
+        if state.get("degraded"):
+            logger.info("---DECISION: DEGRADED MODE, SKIP GRADING AND WEB SEARCH---")
+            return "generate"
+        return "grade_documents"
     
     def decide_to_generate(self, state: GraphState) -> Literal["transform_query", "generate"]:
         logger.info("---ASSESS GRADED DOCUMENTS---")
@@ -164,17 +195,32 @@ Improved question:"""
             logger.info("---DECISION: RELEVANT DOCUMENTS FOUND, GENERATE---")
             return "generate"
     
+    def _stage(self, name: str, node):
+        def run(state: GraphState):
+            with stage(name):
+                return node(state)
+        return run
+    
     def _build_graph(self):
+        from langgraph.graph import END, StateGraph, START
+        
         workflow = StateGraph(GraphState)
         
-        workflow.add_node("retrieve", self.retrieve)
-        workflow.add_node("grade_documents", self.grade_documents)
-        workflow.add_node("generate", self.generate)
-        workflow.add_node("transform_query", self.transform_query)
-        workflow.add_node("web_search", self.web_search)
+        workflow.add_node("retrieve", self._stage("retrieve", self.retrieve))
+        workflow.add_node("grade_documents", self._stage("grade_documents", self.grade_documents))
+        workflow.add_node("generate", self._stage("generate", self.generate))
+        workflow.add_node("transform_query", self._stage("transform_query", self.transform_query))
+        workflow.add_node("web_search", self._stage("web_search", self.web_search))
         
         workflow.add_edge(START, "retrieve")
-        workflow.add_edge("retrieve", "grade_documents")
+        workflow.add_conditional_edges(
+            "retrieve",
+            self.decide_after_retrieve,
+            {
+                "grade_documents": "grade_documents",
+                "generate": "generate",
+            },
+        )
         workflow.add_conditional_edges(
             "grade_documents",
             self.decide_to_generate,
@@ -200,15 +246,16 @@ Improved question:"""
         except Exception as e:
             logger.error(f"Failed to save graph: {str(e)}")
     
-    def run(self, question: str) -> str:
+    def run(self, question: str, collection: Optional[str] = None, degraded: bool = False) -> str:
         if self.app is None:
             raise ValueError("Workflow not setup. Call setup() first.")
         
-        inputs = {"question": question}
+        inputs = {"question": question, "collection": collection, "degraded": degraded}
         
-        for output in self.app.stream(inputs):
-            for key, value in output.items():
-                logger.info(f"Node '{key}' completed")
+        with stage("agent"):
+            for output in self.app.stream(inputs):
+                for key, value in output.items():
+                    logger.debug(f"Node '{key}' completed")
         
         final_generation = value.get("generation", "No answer generated")
         return final_generation
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Set, Tuple
+from project.pipeline.rag import RAGPipeline
+from project.utils.config_loader import load_config
+from project.logger.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BatchRunner:
+    """Answers JSONL question files offline.
+
+    Questions are streamed in batches: each batch is embedded in one call, searched
+    as a single FAISS matrix query and reranked, then generation runs on a bounded
+    worker pool whose LLM calls are rate-limited by the shared LLM gateway. Every
+    answer is appended to the output file as soon as it completes, so an
+    interrupted run resumes by skipping ids already answered. Failed records are
+    dropped on resume and their questions retried, so the output keeps one
+    record per id.
+    """
+
+    def __init__(self, rag_pipeline: RAGPipeline, config_path: str = None):
+        self.rag_pipeline = rag_pipeline
+        self.config = load_config(config_path)
+        batch_config = self.config.get('batch', {})
+        self.batch_size = batch_config.get('batch_size', 64)
+        self.max_concurrency = batch_config.get('max_concurrency', 8)
+        self.fetch_k = batch_config.get('fetch_k', 6)
+        logger.info(f"BatchRunner initialized with batch_size={self.batch_size}")
+
+    @staticmethod
+    def _parse_record(line: str) -> Any:
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            # A partial trailing line from an interrupted run
+            return None
+
+    def _prepare_output(self, output_path: Path) -> Set[str]:
+        """Returns the answered ids, first removing failed records and partial lines."""
+        completed = set()
+        if not output_path.exists():
+            return completed
+
+        dropped = 0
+        with open(output_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                record = self._parse_record(line)
+                if not isinstance(record, dict) or "error" in record:
+                    dropped += 1
+                else:
+                    completed.add(str(record.get("id")))
+
+        if dropped:
+            temp_path = output_path.with_name(output_path.name + ".tmp")
+            with open(output_path, 'r', encoding='utf-8') as source, \
+                    open(temp_path, 'w', encoding='utf-8') as target:
+                for line in source:
+                    record = self._parse_record(line)
+                    if isinstance(record, dict) and "error" not in record:
+                        target.write(line if line.endswith("\n") else line + "\n")
+            os.replace(temp_path, output_path)
+            logger.info(f"Removed {dropped} failed or partial records; their questions will be retried")
+        return completed
+
+    @staticmethod
+    def _terminate_partial_line(output_path: Path):
+        if not output_path.exists() or output_path.stat().st_size == 0:
+            return
+        with open(output_path, 'rb+') as file:
+            file.seek(-1, 2)
+            if file.read(1) != b"\n":
+                file.write(b"\n")
+
+    @staticmethod
+    def _read_questions(input_path: Path, skip_ids: Set[str], stats: Dict[str, int]) -> Iterator[Tuple[Any, str]]:
+        with open(input_path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Skipping line {line_number}: invalid JSON ({str(e)})")
+                    stats["invalid"] += 1
+                    continue
+                if not isinstance(record, dict):
+                    logger.warning(f"Skipping line {line_number}: expected a JSON object")
+                    stats["invalid"] += 1
+                    continue
+                question = record.get("question") or record.get("query")
+                # The id is echoed as given; only the resume lookup compares it as a string
+                question_id = record.get("id", line_number)
+                if not question:
+                    logger.warning(f"Skipping line {line_number}: no question field")
+                    stats["invalid"] += 1
+                    continue
+                if str(question_id) in skip_ids:
+                    stats["skipped"] += 1
+                    continue
+                yield question_id, question
+
+    def _batches(self, questions: Iterator[Tuple[Any, str]]) -> Iterator[List[Tuple[Any, str]]]:
+        batch = []
+        for item in questions:
+            batch.append(item)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _generate(self, question_id: Any, question: str, documents: List[Any]) -> Dict[str, Any]:
+        record = {
+            "id": question_id,
+            "question": question,
+            "sources": [
+                {"source": doc.metadata.get("source"), "page": doc.metadata.get("page")}
+                for doc in documents
+            ]
+        }
+        try:
+            record["answer"] = self.rag_pipeline.generate(question, documents)
+        except Exception as e:
+            logger.error(f"Generation failed for {question_id}: {str(e)}")
+            record["error"] = str(e)
+        return record
+
+    def run(self, input_path: str, output_path: str) -> Dict[str, int]:
+        input_path = Path(input_path)
+        output_path = Path(output_path)
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+        completed = self._prepare_output(output_path)
+        self._terminate_partial_line(output_path)
+        if completed:
+            logger.info(f"Resuming: {len(completed)} questions already answered")
+
+        stats = {"answered": 0, "failed": 0, "skipped": 0, "invalid": 0}
+        retriever = self.rag_pipeline.retriever_module
+        reranker = self.rag_pipeline.reranker
+        max_pending = self.max_concurrency * 2
+        fetch_k = self.fetch_k
+        if self.rag_pipeline.hierarchical:
+            fetch_k = self.rag_pipeline.hierarchy_config.get('child_fetch_k', 12)
+        start = time.perf_counter()
+
+        def drain(pending, output_file, block_until: int):
+            while len(pending) > block_until:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    record = future.result()
+                    output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output_file.flush()
+                    stats["failed" if "error" in record else "answered"] += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor, \
+                open(output_path, 'a', encoding='utf-8') as output_file:
+            pending = set()
+            for batch in self._batches(self._read_questions(input_path, completed, stats)):
+                ids = [question_id for question_id, _ in batch]
+                questions = [question for _, question in batch]
+
+                candidates = retriever.batch_search(questions, k=fetch_k)
+                if self.rag_pipeline.hierarchical:
+                    reranked = [
+                        retriever.expand_to_parents(children, reranker.top_k)
+                        for children in reranker.rerank_batch(questions, candidates, top_k=fetch_k)
+                    ]
+                else:
+                    reranked = reranker.rerank_batch(questions, candidates)
+
+                for question_id, question, documents in zip(ids, questions, reranked):
+                    drain(pending, output_file, max_pending - 1)
+                    pending.add(executor.submit(self._generate, question_id, question, documents))
+
+                logger.info(
+                    f"Batch queued: {stats['answered'] + stats['failed'] + len(pending)} questions "
+                    f"in {time.perf_counter() - start:.1f}s"
+                )
+            drain(pending, output_file, 0)
+
+        logger.info(
+            f"Batch run complete: {stats['answered']} answered, {stats['failed']} failed, "
+            f"{stats['skipped']} skipped, {stats['invalid']} invalid in {time.perf_counter() - start:.1f}s"
+        )
+        return stats
@@ -0,0 +1,130 @@
+import re
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, List
+from project.model.retriever import DocumentRetriever
+from project.source.data_preparation import DataPreparation
+from project.utils.config_loader import load_config
+from project.logger.logging import get_logger
+
+logger = get_logger(__name__)
+
+COLLECTION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class CollectionManager:
+    """Serves many document collections from per-collection persisted FAISS indexes.
+
+    Collections load lazily on first query (built from their configured source and
+    saved on first use), stay resident while hot, and the least recently used ones
+    are evicted once resident indexes exceed the memory budget.
+    """
+
+    def __init__(
+        self,
+        retriever_module: DocumentRetriever,
+        data_prep: DataPreparation,
+        config_path: str = None
+    ):
+        self.config = load_config(config_path)
+        collections_config = self.config.get('collections', {})
+        self.retriever_module = retriever_module
+        self.data_prep = data_prep
+        self.index_dir = Path(collections_config.get('index_dir', 'faiss_index'))
+        self.memory_budget = collections_config.get('memory_budget_mb', 512) * 1024 * 1024
+        self.sources: Dict[str, Dict[str, Any]] = collections_config.get('sources') or {}
+        self._resident: "OrderedDict[str, tuple]" = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        logger.info(f"CollectionManager initialized with {len(self.sources)} configured collections")
+
+    def _index_path(self, collection_id: str) -> Path:
+        return self.index_dir / collection_id
+
+    def _is_persisted(self, collection_id: str) -> bool:
+        return (self._index_path(collection_id) / "index.faiss").exists()
+
+    def list_collections(self) -> List[str]:
+        persisted = set()
+        if self.index_dir.exists():
+            persisted = {path.name for path in self.index_dir.iterdir() if (path / "index.faiss").exists()}
+        return sorted(persisted | set(self.sources))
+
+    def resident_collections(self) -> Dict[str, int]:
+        with self._lock:
+            return {collection_id: size for collection_id, (_, size) in self._resident.items()}
+
+    @staticmethod
+    def _estimate_bytes(vectorstore: Any) -> int:
+        index = vectorstore.index
+        memory_bytes = getattr(index, 'memory_bytes', None)
+        size = memory_bytes() if callable(memory_bytes) else index.ntotal * index.d * 4
+        documents = getattr(vectorstore.docstore, '_dict', {})
+        size += sum(len(doc.page_content) + len(str(doc.metadata)) for doc in documents.values())
+        return size
+
+    def _load(self, collection_id: str) -> Any:
+        path = self._index_path(collection_id)
+        if self._is_persisted(collection_id):
+            vectorstore = self.retriever_module.load_vectorstore(str(path))
+            return self.retriever_module.quantize(vectorstore, f"collection_{collection_id}")
+
+        source = self.sources[collection_id]
+        chunks = self.data_prep.prepare_documents(
+            pdf_path=source.get('pdf_path'),
+            use_attention_paper=source.get('use_attention_paper', False)
+        )
+        vectorstore = self.retriever_module.build_vectorstore(chunks)
+        path.mkdir(parents=True, exist_ok=True)
+        vectorstore.save_local(str(path))
+        logger.info(f"Collection '{collection_id}' built and saved to {path}")
+        return self.retriever_module.quantize(vectorstore, f"collection_{collection_id}")
+
+    def _evict(self, keep: str):
+        while self._resident_bytes > self.memory_budget and len(self._resident) > 1:
+            collection_id, (_, size) = next(iter(self._resident.items()))
+            if collection_id == keep:
+                self._resident.move_to_end(collection_id)
+                continue
+            vectorstore, _ = self._resident.pop(collection_id)
+            self._resident_bytes -= size
+            # Quantized indexes own a float file on disk; requests still holding it keep their mapping
+            close = getattr(vectorstore.index, 'close', None)
+            if callable(close):
+                close()
+            logger.info(f"Evicted collection '{collection_id}' ({size / 1e6:.1f} MB)")
+
+    def get_vectorstore(self, collection_id: str) -> Any:
+        if not COLLECTION_ID_PATTERN.match(collection_id or ""):
+            raise ValueError(f"Invalid collection id: {collection_id!r}")
+
+        with self._lock:
+            entry = self._resident.get(collection_id)
+            if entry is not None:
+                self._resident.move_to_end(collection_id)
+                return entry[0]
+            if collection_id not in self.sources and not self._is_persisted(collection_id):
+                raise ValueError(f"Unknown collection: {collection_id}")
+            load_lock = self._load_locks.setdefault(collection_id, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._resident.get(collection_id)
+                if entry is not None:
+                    self._resident.move_to_end(collection_id)
+                    return entry[0]
+
+            vectorstore = self._load(collection_id)
+            size = self._estimate_bytes(vectorstore)
+
+            with self._lock:
+                self._resident[collection_id] = (vectorstore, size)
+                self._resident_bytes += size
+                self._evict(keep=collection_id)
+            logger.info(f"Collection '{collection_id}' resident ({size / 1e6:.1f} MB)")
+            return vectorstore
+
+    def get_retriever(self, collection_id: str) -> Any:
+        return self.retriever_module.build_retriever(self.get_vectorstore(collection_id))
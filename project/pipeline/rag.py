@@ -1,13 +1,15 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from langchain.schema import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from project.source.data_preparation import DataPreparation
 from project.model.retriever import DocumentRetriever
 from project.model.reranking import DocumentReranker
+from project.pipeline.collection_manager import CollectionManager
 from project.utils.model_loader import ModelLoader
 from project.prompts.prompt_template import RAG_PROMPT
 from project.logger.logging import get_logger
+from project.utils.profiling import stage
 
 logger = get_logger(__name__)
 
@@ -17,29 +19,68 @@ class RAGPipeline:
     def __init__(self, config_path: str = None):
         self.config_path = config_path
         self.model_loader = ModelLoader(config_path)
-        self.llm = self.model_loader.load_llm()
+        self.llm = self.model_loader.load_llm(priority="generation")
         self.data_prep = DataPreparation()
         self.retriever_module = DocumentRetriever(config_path)
         self.reranker = DocumentReranker(config_path)
+        self.collections = CollectionManager(self.retriever_module, self.data_prep, config_path)
         self.chain = None
+        self.answer_chain = None
         self.retriever = None
+        self.hierarchy_config = self.retriever_module.config.get('hierarchy', {})
+        self.hierarchical = False
         logger.info("RAGPipeline initialized")
     
     def setup(self, pdf_path: str = None, use_attention_paper: bool = True):
-        chunks = self.data_prep.prepare_documents(
+        if self.hierarchy_config.get('enabled', False):
+            self._setup_hierarchical(pdf_path, use_attention_paper)
+        else:
+            chunks = self.data_prep.prepare_documents(
+                pdf_path=pdf_path,
+                use_attention_paper=use_attention_paper
+            )
+            
+            self.retriever_module.create_vectorstore(chunks)
+            self.retriever = self.retriever_module.get_base_retriever()
+        
+        self._build_chain()
+        logger.info("RAG pipeline setup complete")
+    
+    def _setup_hierarchical(self, pdf_path: str, use_attention_paper: bool):
+        parents, children = self.data_prep.prepare_hierarchical_documents(
             pdf_path=pdf_path,
-            use_attention_paper=use_attention_paper
+            use_attention_paper=use_attention_paper,
+            parent_chunk_size=self.hierarchy_config.get('parent_chunk_size'),
+            child_chunk_size=self.hierarchy_config.get('child_chunk_size', 400),
+            child_chunk_overlap=self.hierarchy_config.get('child_chunk_overlap', 50)
         )
         
-        self.retriever_module.create_vectorstore(chunks)
-        self.retriever = self.retriever_module.get_base_retriever()
+        self.retriever_module.create_hierarchical_vectorstore(parents, children)
+        self.retriever = self.retriever_module.get_base_retriever(
+            k=self.hierarchy_config.get('child_fetch_k', 12)
+        )
+        self.hierarchical = True
+        logger.info("Hierarchical retrieval enabled for the default index; collections use flat chunks")
+    
+    def rerank(self, query: str, documents: List[Document], hierarchical: bool = None) -> List[Document]:
+        if hierarchical is None:
+            hierarchical = self.hierarchical
+        if not hierarchical:
+            return self.reranker.rerank(query, documents)
         
-        self._build_chain()
-        logger.info("RAG pipeline setup complete")
+        # Rank every short child passage, then send only the top-k parents onward
+        ranked_children = self.reranker.rerank(query, documents, top_k=len(documents))
+        return self.retriever_module.expand_to_parents(ranked_children, self.reranker.top_k)
     
-    def _retrieve_and_rerank(self, query: str) -> List[Document]:
-        retrieved_docs = self.retriever.invoke(query)
-        reranked_docs = self.reranker.rerank(query, retrieved_docs)
+    def _retrieve_and_rerank(self, query: str, collection: Optional[str] = None) -> List[Document]:
+        if collection:
+            retriever = self.collections.get_retriever(collection)
+        else:
+            retriever = self.retriever
+        with stage("vector_search"):
+            retrieved_docs = retriever.invoke(query)
+        with stage("rerank"):
+            reranked_docs = self.rerank(query, retrieved_docs, hierarchical=self.hierarchical and not collection)
         return reranked_docs
     
     def _format_docs(self, docs: List[Document]) -> str:
@@ -49,10 +90,11 @@ class RAGPipeline:
         ])
     
     def _build_chain(self):
+        self.answer_chain = RAG_PROMPT | self.llm | StrOutputParser()
         self.chain = (
             {
                 "context": lambda x: self._format_docs(
-                    self._retrieve_and_rerank(x["question"])
+                    self._retrieve_and_rerank(x["question"], x.get("collection"))
                 ),
                 "question": lambda x: x["question"]
             }
@@ -62,16 +104,25 @@ class RAGPipeline:
         )
         logger.info("RAG chain built successfully")
     
-    def invoke(self, query: str) -> str:
+    def invoke(self, query: str, collection: Optional[str] = None) -> str:
         if self.chain is None:
             raise ValueError("Pipeline not setup. Call setup() first.")
         
-        response = self.chain.invoke({"question": query})
-        logger.info(f"Query processed successfully")
+        response = self.chain.invoke({"question": query, "collection": collection})
+        logger.debug(f"Query processed successfully")
         return response
     
-    def get_retrieved_documents(self, query: str) -> List[Document]:
+    def get_retrieved_documents(self, query: str, collection: Optional[str] = None) -> List[Document]:
         if self.retriever is None:
             raise ValueError("Pipeline not setup. Call setup() first.")
         
-        return self._retrieve_and_rerank(query)
+        return self._retrieve_and_rerank(query, collection)
+    
+    def generate(self, query: str, documents: List[Document]) -> str:
+        if self.answer_chain is None:
+            raise ValueError("Pipeline not setup. Call setup() first.")
+        
+        return self.answer_chain.invoke({
+            "context": self._format_docs(documents),
+            "question": query
+        })
@@ -1,8 +1,6 @@
 import os
 from pathlib import Path
-from typing import List, Optional
-from langchain_community.document_loaders import PyPDFLoader, ArxivLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Optional, Tuple
 from langchain.schema import Document
 from project.logger.logging import get_logger
 
@@ -18,6 +16,7 @@ class DataPreparation:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -35,6 +34,7 @@ class DataPreparation:
 
         logger.info(f"PDF not found locally. Downloading from ArXiv: {arxiv_id}")
         try:
+            from langchain_community.document_loaders import ArxivLoader
             loader = ArxivLoader(query=arxiv_id, load_max_docs=1)
             documents = loader.load()
             if documents:
@@ -49,6 +49,7 @@ class DataPreparation:
     
     def _load_pdf(self, pdf_path: str) -> List[Document]:
         try:
+            from langchain_community.document_loaders import PyPDFLoader
             loader = PyPDFLoader(pdf_path)
             documents = loader.load()
             logger.info(f"Loaded {len(documents)} pages from PDF")
@@ -72,19 +73,21 @@ class DataPreparation:
             logger.error(f"Failed to split documents: {str(e)}")
             raise
     
+    def _load_documents(self, pdf_path: Optional[str], use_attention_paper: bool) -> List[Document]:
+        if pdf_path:
+            return self.load_custom_pdf(pdf_path)
+        elif use_attention_paper:
+            return self.load_attention_paper()
+        else:
+            raise ValueError("Either provide pdf_path or set use_attention_paper=True")
+    
     def prepare_documents(
         self, 
         pdf_path: Optional[str] = None,
         use_attention_paper: bool = True
     ) -> List[Document]:
         try:
-            if pdf_path:
-                documents = self.load_custom_pdf(pdf_path)
-            elif use_attention_paper:
-                documents = self.load_attention_paper()
-            else:
-                raise ValueError("Either provide pdf_path or set use_attention_paper=True")
-            
+            documents = self._load_documents(pdf_path, use_attention_paper)
             chunks = self.split_documents(documents)
             
             logger.info(f"Document preparation complete: {len(chunks)} chunks ready")
@@ -93,3 +96,46 @@ class DataPreparation:
         except Exception as e:
             logger.error(f"Document preparation failed: {str(e)}")
             raise
+    
+    def prepare_hierarchical_documents(
+        self,
+        pdf_path: Optional[str] = None,
+        use_attention_paper: bool = True,
+        parent_chunk_size: Optional[int] = None,
+        child_chunk_size: int = 400,
+        child_chunk_overlap: int = 50
+    ) -> Tuple[List[Document], List[Document]]:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        
+        try:
+            documents = self._load_documents(pdf_path, use_attention_paper)
+            
+            # Parents are whole pages unless a parent chunk size is given
+            if parent_chunk_size:
+                parent_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=parent_chunk_size,
+                    chunk_overlap=0,
+                    length_function=len,
+                    separators=["\n\n", "\n", " ", ""]
+                )
+                parents = parent_splitter.split_documents(documents)
+            else:
+                parents = [doc for doc in documents if doc.page_content.strip()]
+            
+            for i, parent in enumerate(parents):
+                parent.metadata["parent_id"] = f"{parent.metadata.get('source', 'doc')}#{i}"
+            
+            child_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=child_chunk_size,
+                chunk_overlap=child_chunk_overlap,
+                length_function=len,
+                separators=["\n\n", "\n", " ", ""]
+            )
+            children = child_splitter.split_documents(parents)
+            
+            logger.info(f"Hierarchical preparation complete: {len(parents)} parents, {len(children)} children")
+            return parents, children
+        
+        except Exception as e:
+            logger.error(f"Document preparation failed: {str(e)}")
+            raise
@@ -0,0 +1,142 @@
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+from project.logger.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed; carries the HTTP status and a Retry-After hint."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Admission:
+    def __init__(self, degraded: bool, queued_ms: float):
+        self.degraded = degraded
+        self.queued_ms = queued_ms
+
+
+class AdmissionController:
+    """Bounded in-flight limit with a bounded FIFO wait queue, for one event loop.
+
+    Requests beyond `max_in_flight` wait in the queue for at most
+    `queue_timeout` seconds; when the queue is full they are rejected at once
+    with 429, and when their deadline passes they get 503. Requests that arrive
+    while the queue is at least `degrade_queue_depth` deep are admitted in
+    degraded mode so callers can skip optional work.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        max_queue: int = 16,
+        queue_timeout: float = 10.0,
+        degrade_queue_depth: int = None,
+        retry_after_seconds: float = 5.0
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.degrade_queue_depth = degrade_queue_depth
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Smoothed request service time, used to estimate Retry-After
+        self._service_seconds = retry_after_seconds
+        self._stats = {"admitted": 0, "degraded": 0, "rejected": 0, "timed_out": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "AdmissionController":
+        admission_config = config.get('admission', {})
+        return cls(
+            max_in_flight=admission_config.get('max_in_flight', 4),
+            max_queue=admission_config.get('max_queue', 16),
+            queue_timeout=admission_config.get('queue_timeout_seconds', 10.0),
+            degrade_queue_depth=admission_config.get('degrade_queue_depth'),
+            retry_after_seconds=admission_config.get('retry_after_seconds', 5.0)
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def overloaded(self) -> bool:
+        return self.queue_depth >= self.max_queue
+
+    def retry_after(self) -> int:
+        backlog = self.queue_depth + self.in_flight
+        return max(1, math.ceil(self._service_seconds * backlog / max(self.max_in_flight, 1)))
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter so a newcomer cannot jump the queue
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+    async def _acquire(self):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if self.overloaded:
+            self._stats["rejected"] += 1
+            raise OverloadedError("Server is at capacity", 429, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait([waiter], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot it may have just been given
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+
+        if not waiter.done():
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            self._stats["timed_out"] += 1
+            raise OverloadedError(
+                f"Request waited more than {self.queue_timeout}s for capacity", 503, self.retry_after()
+            )
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[Admission]:
+        arrived = time.perf_counter()
+        degraded = self.degrade_queue_depth is not None and self.queue_depth >= self.degrade_queue_depth
+        await self._acquire()
+
+        started = time.perf_counter()
+        self._stats["admitted"] += 1
+        if degraded:
+            self._stats["degraded"] += 1
+            logger.warning(f"Admitted in degraded mode (queue depth {self.queue_depth})")
+        try:
+            yield Admission(degraded, round((started - arrived) * 1000, 1))
+        finally:
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.perf_counter() - started)
+            self._release()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "avg_service_seconds": round(self._service_seconds, 2),
+            **self._stats
+        }
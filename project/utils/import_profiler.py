@@ -0,0 +1,73 @@
+import re
+import sys
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List
+from project.utils.config_loader import load_config
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(module: str = "app") -> List[Dict[str, Any]]:
+    """Imports `module` in a fresh interpreter with -X importtime and parses the timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=str(Path(__file__).resolve().parents[2])
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2
+            })
+    return entries
+
+
+def check_import_budget(module: str = "app", config_path: str = None) -> Dict[str, Any]:
+    startup_config = load_config(config_path).get('startup', {})
+    budget_ms = startup_config.get('import_budget_ms', 1000)
+    deferred = startup_config.get('deferred_modules', [])
+
+    entries = profile_imports(module)
+    top_level = [entry for entry in entries if entry["module"] == module]
+    total_ms = top_level[-1]["cumulative_ms"] if top_level else 0.0
+    imported = {entry["module"].split(".")[0] for entry in entries}
+    eager = sorted(imported & set(deferred))
+
+    return {
+        "module": module,
+        "total_ms": total_ms,
+        "budget_ms": budget_ms,
+        "eager_deferred_modules": eager,
+        "ok": total_ms <= budget_ms and not eager,
+        "entries": entries
+    }
+
+
+def format_report(report: Dict[str, Any], top: int = 20) -> str:
+    slowest = sorted(report["entries"], key=lambda entry: entry["cumulative_ms"], reverse=True)[:top]
+    lines = [
+        f"Import of '{report['module']}': {report['total_ms']:.0f} ms (budget {report['budget_ms']} ms)",
+        "",
+        f"{'cumulative ms':>14} {'self ms':>9}  module",
+    ]
+    for entry in slowest:
+        lines.append(
+            f"{entry['cumulative_ms']:>14.1f} {entry['self_ms']:>9.1f}  {'  ' * entry['depth']}{entry['module']}"
+        )
+    if report["eager_deferred_modules"]:
+        lines.append("")
+        lines.append(f"Heavy modules imported eagerly: {', '.join(report['eager_deferred_modules'])}")
+    lines.append("")
+    lines.append("PASS" if report["ok"] else "FAIL")
+    return "\n".join(lines)
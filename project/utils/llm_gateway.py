@@ -0,0 +1,263 @@
+import time
+import heapq
+import random
+import itertools
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+from langchain_core.runnables import Runnable
+from project.logger.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """Client-side budget refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: Optional[float] = None, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0 if per_minute else None
+        self.capacity = capacity or per_minute or 0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.rate is None:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if self.rate is not None:
+            self.tokens -= min(amount, self.capacity)
+
+    def available(self) -> Optional[float]:
+        if self.rate is None:
+            return None
+        self._refill(time.monotonic())
+        return round(self.tokens, 1)
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status == 429:
+        return True
+    message = str(error).lower()
+    return "rate limit" in message or "429" in message
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        value = headers.get('retry-after')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    """Shared scheduler in front of one LLM.
+
+    Callers queue by priority (lower value wins) and are admitted when a
+    concurrency slot plus request and token budget are available. 429s are
+    retried with jittered backoff, slow calls can be hedged with a second
+    request, and a fallback model is tried when the primary keeps failing.
+    """
+
+    def __init__(self, llm: Any, config: Dict[str, Any], fallback_llm: Any = None):
+        self.llm = llm
+        self.fallback_llm = fallback_llm
+        gateway_config = config.get('llm_gateway', {})
+        self.request_bucket = TokenBucket(gateway_config.get('requests_per_minute'))
+        self.token_bucket = TokenBucket(gateway_config.get('tokens_per_minute'))
+        self.max_concurrency = gateway_config.get('max_concurrency', 8)
+        self.expected_output_tokens = gateway_config.get('expected_output_tokens', 256)
+        self.max_retries = gateway_config.get('max_retries', 3)
+        self.retry_base_delay = gateway_config.get('retry_base_delay', 1.0)
+        self.retry_max_delay = gateway_config.get('retry_max_delay', 20.0)
+        self.hedge_after = gateway_config.get('hedge_after_seconds')
+        self.priorities = gateway_config.get('priorities', {})
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency * 2,
+            thread_name_prefix="llm-gateway"
+        )
+        self._stats = {
+            "requests": 0,
+            "failures": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "fallbacks": 0,
+            "queue_wait_seconds": 0.0,
+        }
+
+    def _priority(self, priority: Any) -> int:
+        if isinstance(priority, int):
+            return priority
+        return self.priorities.get(priority, self.priorities.get('default', 1))
+
+    def _estimate_tokens(self, input: Any) -> int:
+        if hasattr(input, 'to_string'):
+            text = input.to_string()
+        else:
+            text = str(input)
+        return len(text) // 4 + self.expected_output_tokens
+
+    def _acquire(self, priority: int, tokens: int):
+        ticket = (priority, next(self._sequence))
+        enqueued_at = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            while True:
+                if self._queue[0] == ticket and self._in_flight < self.max_concurrency:
+                    now = time.monotonic()
+                    delay = max(
+                        self.request_bucket.wait_time(1, now),
+                        self.token_bucket.wait_time(tokens, now)
+                    )
+                    if delay <= 0:
+                        heapq.heappop(self._queue)
+                        self.request_bucket.consume(1)
+                        self.token_bucket.consume(tokens)
+                        self._in_flight += 1
+                        self._stats["queue_wait_seconds"] += now - enqueued_at
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+
+    def _try_acquire(self, tokens: int) -> bool:
+        with self._cond:
+            if self._queue or self._in_flight >= self.max_concurrency:
+                return False
+            now = time.monotonic()
+            if self.request_bucket.wait_time(1, now) > 0 or self.token_bucket.wait_time(tokens, now) > 0:
+                return False
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(tokens)
+            self._in_flight += 1
+            return True
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _call(self, llm: Any, input: Any, tokens: int, config: Any, kwargs: Dict[str, Any]) -> Any:
+        """Runs one attempt on an acquired slot and releases it when the call finishes."""
+        if not self.hedge_after:
+            try:
+                return llm.invoke(input, config=config, **kwargs)
+            finally:
+                self._release()
+
+        try:
+            primary = self._executor.submit(llm.invoke, input, config=config, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # The primary keeps its slot until it actually finishes, even if a hedge wins first
+        primary.add_done_callback(lambda _: self._release())
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done or not self._try_acquire(tokens):
+            return primary.result()
+
+        with self._cond:
+            self._stats["hedges"] += 1
+        hedge = self._executor.submit(llm.invoke, input, config=config, **kwargs)
+        hedge.add_done_callback(lambda _: self._release())
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._cond:
+                            self._stats["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _invoke_with_retries(self, llm: Any, input: Any, priority: int, config: Any, kwargs: Dict[str, Any]) -> Any:
+        tokens = self._estimate_tokens(input)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(priority, tokens)
+            try:
+                return self._call(llm, input, tokens, config, kwargs)
+            except Exception as e:
+                if not _is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                with self._cond:
+                    self._stats["rate_limited"] += 1
+                    self._stats["retries"] += 1
+                backoff = min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt)
+                delay = _retry_after(e) or random.uniform(backoff / 2, backoff)
+                logger.warning(f"LLM rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+
+    def invoke(self, input: Any, priority: Any = "default", config: Any = None, **kwargs) -> Any:
+        priority = self._priority(priority)
+        with self._cond:
+            self._stats["requests"] += 1
+        try:
+            return self._invoke_with_retries(self.llm, input, priority, config, kwargs)
+        except Exception as e:
+            if self.fallback_llm is None:
+                with self._cond:
+                    self._stats["failures"] += 1
+                raise
+            logger.warning(f"Primary LLM failed ({str(e)}), using fallback model")
+            with self._cond:
+                self._stats["fallbacks"] += 1
+            try:
+                return self._invoke_with_retries(self.fallback_llm, input, priority, config, kwargs)
+            except Exception:
+                with self._cond:
+                    self._stats["failures"] += 1
+                raise
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            queued_by_priority: Dict[int, int] = {}
+            for priority, _ in self._queue:
+                queued_by_priority[priority] = queued_by_priority.get(priority, 0) + 1
+            return {
+                "queued": len(self._queue),
+                "queued_by_priority": queued_by_priority,
+                "in_flight": self._in_flight,
+                "request_budget": self.request_bucket.available(),
+                "token_budget": self.token_bucket.available(),
+                **self._stats,
+                "queue_wait_seconds": round(self._stats["queue_wait_seconds"], 3),
+            }
+
+
+class GatewayLLM(Runnable):
+    """Runnable view of an LLMGateway at a fixed priority, usable inside chains."""
+
+    def __init__(self, gateway: LLMGateway, priority: Any = "default"):
+        self.gateway = gateway
+        self.priority = priority
+
+    def invoke(self, input: Any, config: Any = None, **kwargs) -> Any:
+        return self.gateway.invoke(input, priority=self.priority, config=config, **kwargs)
+
+    def with_priority(self, priority: Any) -> "GatewayLLM":
+        return GatewayLLM(self.gateway, priority)
@@ -1,13 +1,25 @@
 import os
-from typing import Any
+import threading
+from typing import TYPE_CHECKING, Any, Dict
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_community.embeddings import FastEmbedEmbeddings
 from project.utils.config_loader import load_config
 from project.logger.logging import get_logger
 
+if TYPE_CHECKING:
+    from project.utils.llm_gateway import LLMGateway
+
 logger = get_logger(__name__)
 
+# One gateway per model so every loader shares the same rate-limit budget
+_gateways: Dict[tuple, "LLMGateway"] = {}
+_gateways_lock = threading.Lock()
+
+
+def gateway_metrics() -> Dict[str, Any]:
+    with _gateways_lock:
+        gateways = dict(_gateways)
+    return {f"{provider}:{model}": gateway.metrics() for (provider, model), gateway in gateways.items()}
+
 
 class ModelLoader:
     def __init__(self, config_path: str = None):
@@ -24,21 +36,44 @@ class ModelLoader:
             logger.info("GROQ API key loaded")
         
     
-    def load_llm(self) -> Any:
+    def _create_llm(self, provider: str, model_name: str) -> Any:
+        llm_config = self.config.get('llm', {})
+        
+        if provider == 'langchain_groq':
+            from langchain_groq import ChatGroq
+            model = ChatGroq(
+                model=model_name,
+                temperature=llm_config.get('temperature', 0.1),
+                max_tokens=llm_config.get('max_tokens', 2048),
+                # Retries belong to the gateway so they pass through its rate budgets
+                max_retries=0
+            )
+            logger.info(f"Loaded Groq LLM: {model_name}")
+            return model
+        elif provider == 'fake':
+            from langchain_core.language_models.fake_chat_models import FakeListChatModel
+            model = FakeListChatModel(responses=llm_config.get('fake_responses', ["yes"]))
+            logger.info("Loaded fake LLM")
+            return model
+        else:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+    
+    def load_llm(self, priority: str = "default") -> Any:
         llm_config = self.config.get('llm', {})
         provider = llm_config.get('provider', 'langchain_groq')
+        model_name = llm_config.get('model', 'openai/gpt-oss-20b')
+        key = (provider, model_name)
+        from project.utils.llm_gateway import GatewayLLM, LLMGateway
         
         try:
-            if provider == 'langchain_groq':
-                model = ChatGroq(
-                    model=llm_config.get('model', 'openai/gpt-oss-20b'),
-                    temperature=llm_config.get('temperature', 0.1),
-                    max_tokens=llm_config.get('max_tokens', 2048)
-                )
-                logger.info(f"Loaded Groq LLM: {llm_config.get('model')}")
-                return model
-            else:
-                raise ValueError(f"Unsupported LLM provider: {provider}")
+            with _gateways_lock:
+                gateway = _gateways.get(key)
+                if gateway is None:
+                    fallback_model = llm_config.get('fallback_model')
+                    fallback = self._create_llm(provider, fallback_model) if fallback_model else None
+                    gateway = LLMGateway(self._create_llm(provider, model_name), self.config, fallback)
+                    _gateways[key] = gateway
+            return GatewayLLM(gateway, priority)
         except Exception as e:
             logger.error(f"Failed to load LLM: {str(e)}")
             raise
@@ -49,6 +84,7 @@ class ModelLoader:
         
         try:
             if provider == 'fastembedding':
+                from langchain_community.embeddings import FastEmbedEmbeddings
                 embeddings = FastEmbedEmbeddings(
                     model_name=embed_config.get('model_name', 'BAAI/bge-small-en-v1.5')
                 )
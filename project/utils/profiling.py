@@ -0,0 +1,280 @@
+import os
+import re
+import sys
+import hmac
+import time
+import random
+import threading
+import tracemalloc
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from project.utils.config_loader import load_config
+from project.logger.logging import log_stage
+
+PROFILING_CONFIG = load_config().get('profiling', {})
+
+_profile: contextvars.ContextVar = contextvars.ContextVar("profile", default=None)
+
+# tracemalloc is process-wide, so at most one capture runs at a time
+_capture_slot = threading.Lock()
+
+# Frames from these files are left out of allocation diffs
+_IGNORED_FILES = (tracemalloc.__file__, __file__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = os.path.join(*code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_name} ({filename})"
+
+
+class Profile:
+    """Stack samples and allocation diffs for the stages run while it is active.
+
+    Samples are keyed by the stage path (e.g. "agent;retrieve;vector_search")
+    followed by the Python stack, in collapsed-stack format. Each stage records
+    its net allocations by line and its peak traced memory above the level at
+    entry (sampled, so short spikes can be missed). Both are inclusive of nested
+    stages, and since tracemalloc is process-wide they also pick up whatever
+    concurrent requests allocate during the stage.
+    """
+
+    def __init__(self, top_allocations: int = 10):
+        self.top_allocations = top_allocations
+        self.samples: Counter = Counter()
+        self.stage_samples: Counter = Counter()
+        self.allocations: Dict[str, Dict[str, Any]] = {}
+        self.peaks: Counter = Counter()
+        self._stacks: Dict[int, List[Tuple[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _track_peaks(self, stacks: List[List[Tuple[str, int]]]):
+        current = tracemalloc.get_traced_memory()[0]
+        for stack in stacks:
+            for name, baseline in stack:
+                self.peaks[name] = max(self.peaks[name], current - baseline)
+
+    def _enter(self, name: str) -> Optional[tracemalloc.Snapshot]:
+        before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        # Baseline taken after the snapshot so its own size does not count as stage memory
+        baseline = tracemalloc.get_traced_memory()[0] if before is not None else 0
+        with self._lock:
+            self._stacks.setdefault(threading.get_ident(), []).append((name, baseline))
+        return before
+
+    def _exit(self, name: str, before: Optional[tracemalloc.Snapshot]):
+        thread_id = threading.get_ident()
+        if before is None or not tracemalloc.is_tracing():
+            with self._lock:
+                self._pop(thread_id)
+            return
+
+        with self._lock:
+            stack = self._stacks.get(thread_id, [])
+            self._track_peaks([stack[-1:]])
+            self._pop(thread_id)
+        filters = [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+        diff = after.compare_to(before.filter_traces(filters), 'lineno')
+
+        with self._lock:
+            entry = self.allocations.setdefault(name, {"calls": 0, "net_bytes": 0, "sites": Counter()})
+            entry["calls"] += 1
+            for stat in diff:
+                entry["net_bytes"] += stat.size_diff
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    entry["sites"][f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+
+    def _pop(self, thread_id: int):
+        stack = self._stacks.get(thread_id, [])
+        if stack:
+            stack.pop()
+        if not stack:
+            self._stacks.pop(thread_id, None)
+
+    def sample(self, frames: Dict[int, Any]):
+        with self._lock:
+            stacks = [(thread_id, list(stack)) for thread_id, stack in self._stacks.items() if stack]
+            if stacks and tracemalloc.is_tracing():
+                self._track_peaks([stack for _, stack in stacks])
+
+        for thread_id, stack in stacks:
+            frame = frames.get(thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            stage_path = ";".join(name for name, _ in stack)
+            self.samples[";".join([stage_path] + labels[::-1])] += 1
+            self.stage_samples[stage_path] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+    def allocation_report(self) -> str:
+        lines = []
+        for name, entry in sorted(self.allocations.items(), key=lambda item: -item[1]["net_bytes"]):
+            lines.append(
+                f"{name}: {entry['calls']} calls, net {entry['net_bytes'] / 1024:.1f} KiB, "
+                f"peak +{self.peaks[name] / 1024:.1f} KiB"
+            )
+            for site, size in entry["sites"].most_common(self.top_allocations):
+                lines.append(f"    {size / 1024:>10.1f} KiB  {site}")
+        return "\n".join(lines)
+
+    def summary(self) -> Dict[str, Any]:
+        total = sum(self.stage_samples.values())
+        return {
+            "samples": total,
+            "stage_share": {
+                stage_path: round(count / total, 3)
+                for stage_path, count in self.stage_samples.most_common()
+            } if total else {},
+            "allocated_kib": {
+                name: round(entry["net_bytes"] / 1024, 1) for name, entry in self.allocations.items()
+            },
+            "peak_kib": {name: round(peak / 1024, 1) for name, peak in self.peaks.items()}
+        }
+
+    def save(self, output_dir: str, name: str, keep: int = None) -> Dict[str, str]:
+        """Writes both reports, then deletes the oldest beyond the newest `keep`."""
+        os.makedirs(output_dir, exist_ok=True)
+        # Names can come from client-supplied request ids
+        name = re.sub(r"[^\w.-]", "_", name)
+        paths = {
+            "collapsed": os.path.join(output_dir, f"{name}.collapsed"),
+            "allocations": os.path.join(output_dir, f"{name}.alloc.txt"),
+        }
+        with open(paths["collapsed"], 'w', encoding='utf-8') as file:
+            file.write(self.collapsed() + "\n")
+        with open(paths["allocations"], 'w', encoding='utf-8') as file:
+            file.write(self.allocation_report() + "\n")
+        if keep:
+            _prune(output_dir, keep)
+        return paths
+
+
+def _prune(output_dir: str, keep: int):
+    saved = sorted(
+        (entry for entry in os.scandir(output_dir) if entry.name.endswith(".collapsed")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    for entry in saved[keep:]:
+        stem = entry.path[:-len(".collapsed")]
+        for path in (entry.path, f"{stem}.alloc.txt"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class _Sampler:
+    """One background thread sampling every thread that is inside a profiled stage.
+
+    It only runs while at least one profile is active, so unprofiled traffic
+    pays nothing beyond a context variable lookup per stage.
+    """
+
+    def __init__(self):
+        self.profiles = set()
+        self.interval = 0.01
+        self.thread = None
+        self.started_tracing = False
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile, interval: float, trace_frames: int):
+        with self._lock:
+            if not self.profiles and trace_frames and not tracemalloc.is_tracing():
+                tracemalloc.start(trace_frames)
+                self.started_tracing = True
+            self.profiles.add(profile)
+            self.interval = interval
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self.thread.start()
+
+    def remove(self, profile: Profile):
+        with self._lock:
+            self.profiles.discard(profile)
+            if not self.profiles and self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self.profiles:
+                    self.thread = None
+                    return
+                active = list(self.profiles)
+                interval = self.interval
+            frames = sys._current_frames()
+            for profile in active:
+                profile.sample(frames)
+            del frames
+            time.sleep(interval)
+
+
+_sampler = _Sampler()
+
+
+def should_profile(opt_in: Optional[str] = None) -> Optional[str]:
+    """Why a request should be profiled: "opt_in", "sampled", or None to skip it.
+
+    Only requests whose opt-in matches the PROFILING_TOKEN env var should trace
+    allocations; sampled ones are meant for CPU-only captures, since tracemalloc
+    slows every request in the process while it runs.
+    """
+    expected = os.getenv("PROFILING_TOKEN")
+    if opt_in and expected and hmac.compare_digest(opt_in.encode(), expected.encode()):
+        return "opt_in"
+    if random.random() < PROFILING_CONFIG.get('sample_rate', 0.0):
+        return "sampled"
+    return None
+
+
+@contextmanager
+def capture(
+    interval_ms: float = None,
+    trace_frames: int = None,
+    top_allocations: int = None
+) -> Iterator[Optional[Profile]]:
+    """Profiles every stage entered in this context (and contexts copied from it).
+
+    Yields None, profiling nothing, while another capture is already running.
+    """
+    if not _capture_slot.acquire(blocking=False):
+        yield None
+        return
+
+    interval_ms = interval_ms or PROFILING_CONFIG.get('interval_ms', 10)
+    trace_frames = PROFILING_CONFIG.get('tracemalloc_frames', 1) if trace_frames is None else trace_frames
+    profile = Profile(top_allocations or PROFILING_CONFIG.get('top_allocations', 10))
+
+    token = _profile.set(profile)
+    _sampler.add(profile, interval_ms / 1000, trace_frames)
+    try:
+        yield profile
+    finally:
+        _sampler.remove(profile)
+        _profile.reset(token)
+        _capture_slot.release()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times a pipeline stage and, inside `capture()`, samples and traces it."""
+    with log_stage(name):
+        profile = _profile.get()
+        if profile is None:
+            yield
+            return
+        before = profile._enter(name)
+        try:
+            yield
+        finally:
+            profile._exit(name, before)
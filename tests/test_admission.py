@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from project.utils.admission import AdmissionController, OverloadedError
+
+
+async def hold(controller, release, admissions=None):
+    async with controller.admit() as admission:
+        if admissions is not None:
+            admissions.append(admission)
+        await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(controller, release)) for _ in range(2)]
+        await settle()
+        assert controller.in_flight == 1 and controller.queue_depth == 1
+
+        with pytest.raises(OverloadedError) as rejected:
+            async with controller.admit():
+                pass
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return controller.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["rejected"] == 1
+    assert metrics["admitted"] == 2
+    assert metrics["in_flight"] == 0
+
+
+def test_queue_deadline_returns_503():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(controller, release))
+        await settle()
+
+        with pytest.raises(OverloadedError) as timed_out:
+            async with controller.admit():
+                pass
+        assert timed_out.value.status_code == 503
+        assert controller.queue_depth == 0
+
+        release.set()
+        await holder
+        return controller.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["timed_out"] == 1
+    assert metrics["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=5)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(controller, release))
+        await settle()
+        queued = asyncio.create_task(hold(controller, release))
+        await settle()
+        assert controller.queue_depth == 1
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert controller.queue_depth == 0
+
+        release.set()
+        await holder
+        assert controller.in_flight == 0
+
+        # The freed slot is usable again
+        async with controller.admit() as admission:
+            assert not admission.degraded
+            assert controller.in_flight == 1
+        return controller.metrics()
+
+    assert asyncio.run(scenario())["in_flight"] == 0
+
+
+def test_cancelled_after_handoff_passes_slot_on():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=5)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(controller, release))
+        await settle()
+        queued = asyncio.create_task(hold(controller, asyncio.Event()))
+        await settle()
+
+        # The slot is handed to the waiter and it is cancelled before it resumes
+        release.set()
+        await holder
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        return controller.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["in_flight"] == 0
+    assert metrics["queue_depth"] == 0
+
+
+def test_requests_past_degrade_depth_are_degraded():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=8, queue_timeout=5, degrade_queue_depth=2)
+        release = asyncio.Event()
+        admissions = []
+        tasks = []
+        for _ in range(5):
+            tasks.append(asyncio.create_task(hold(controller, release, admissions)))
+            await settle()
+        assert controller.queue_depth == 4
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return admissions, controller.metrics()
+
+    admissions, metrics = asyncio.run(scenario())
+    # The holder and the first two queued arrived below the threshold
+    assert [admission.degraded for admission in admissions] == [False, False, False, True, True]
+    assert metrics["degraded"] == 2
+    assert metrics["in_flight"] == 0
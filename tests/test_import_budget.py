@@ -0,0 +1,8 @@
+from project.utils.import_profiler import check_import_budget
+
+
+def test_app_import_defers_heavy_modules():
+    # Only the deferred-module list is asserted; import time depends on the machine
+    report = check_import_budget("app")
+
+    assert report["eager_deferred_modules"] == []
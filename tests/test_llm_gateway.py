@@ -0,0 +1,181 @@
+import threading
+import time
+import pytest
+import yaml
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from project.utils import model_loader
+from project.utils.llm_gateway import LLMGateway
+from project.utils.model_loader import ModelLoader
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class ScriptedLLM:
+    """Wraps the fake chat model, raising 429s or sleeping before selected calls."""
+
+    def __init__(self, responses, rate_limited_calls=0, delays=None):
+        self.model = FakeListChatModel(responses=responses)
+        self.rate_limited_calls = rate_limited_calls
+        self.delays = delays or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def invoke(self, input, config=None, **kwargs):
+        with self._lock:
+            call = len(self.calls)
+            self.calls.append(input)
+        if call < self.rate_limited_calls:
+            raise RateLimitError("429 Too Many Requests")
+        time.sleep(self.delays.get(call, 0))
+        return self.model.invoke(input, config=config, **kwargs)
+
+
+def gateway_config(**overrides):
+    config = {
+        "max_concurrency": 2,
+        "max_retries": 3,
+        "retry_base_delay": 0.01,
+        "retry_max_delay": 0.02,
+        "priorities": {"generation": 0, "default": 1, "grading": 2},
+    }
+    config.update(overrides)
+    return {"llm_gateway": config}
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def fake_config(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump({
+        "llm": {"provider": "fake", "model": "fake-test", "fake_responses": ["fake answer"]},
+        "llm_gateway": gateway_config()["llm_gateway"],
+    }))
+    yield str(path)
+    model_loader._gateways.clear()
+
+
+def test_fake_provider_runs_through_gateway(fake_config):
+    llm = ModelLoader(fake_config).load_llm(priority="generation")
+
+    assert llm.invoke("question").content == "fake answer"
+    metrics = model_loader.gateway_metrics()["fake:fake-test"]
+    assert metrics["requests"] == 1
+    assert metrics["in_flight"] == 0
+
+
+def test_loaders_share_one_gateway_per_model(fake_config):
+    first = ModelLoader(fake_config).load_llm(priority="generation")
+    second = ModelLoader(fake_config).load_llm(priority="grading")
+
+    assert first.gateway is second.gateway
+    assert second.with_priority("rewrite").gateway is first.gateway
+
+
+def test_rate_limited_calls_are_retried():
+    llm = ScriptedLLM(["ok"], rate_limited_calls=2)
+    gateway = LLMGateway(llm, gateway_config())
+
+    assert gateway.invoke("question").content == "ok"
+    metrics = gateway.metrics()
+    assert len(llm.calls) == 3
+    assert metrics["rate_limited"] == 2
+    assert metrics["retries"] == 2
+    assert metrics["in_flight"] == 0
+
+
+def test_gives_up_after_max_retries():
+    llm = ScriptedLLM(["ok"], rate_limited_calls=10)
+    gateway = LLMGateway(llm, gateway_config(max_retries=2))
+
+    with pytest.raises(RateLimitError):
+        gateway.invoke("question")
+    metrics = gateway.metrics()
+    assert len(llm.calls) == 3
+    assert metrics["failures"] == 1
+    assert metrics["in_flight"] == 0
+
+
+def test_non_rate_limit_errors_are_not_retried():
+    class BrokenLLM:
+        calls = 0
+
+        def invoke(self, input, config=None, **kwargs):
+            BrokenLLM.calls += 1
+            raise ValueError("bad request")
+
+    gateway = LLMGateway(BrokenLLM(), gateway_config())
+
+    with pytest.raises(ValueError):
+        gateway.invoke("question")
+    assert BrokenLLM.calls == 1
+
+
+def test_fallback_model_used_when_primary_fails():
+    primary = ScriptedLLM(["primary"], rate_limited_calls=10)
+    fallback = FakeListChatModel(responses=["fallback"])
+    gateway = LLMGateway(primary, gateway_config(max_retries=1), fallback_llm=fallback)
+
+    assert gateway.invoke("question").content == "fallback"
+    assert gateway.metrics()["fallbacks"] == 1
+
+
+def test_higher_priority_is_admitted_first():
+    release = threading.Event()
+    order = []
+
+    class RecordingLLM:
+        def invoke(self, input, config=None, **kwargs):
+            if input == "blocker":
+                release.wait(2)
+            order.append(input)
+            return input
+
+    gateway = LLMGateway(RecordingLLM(), gateway_config(max_concurrency=1))
+    threads = [threading.Thread(target=gateway.invoke, args=("blocker",))]
+    threads[0].start()
+    wait_until(lambda: gateway.metrics()["in_flight"] == 1)
+
+    for question, priority, queued in (("grading", "grading", 1), ("generation", "generation", 2)):
+        thread = threading.Thread(target=gateway.invoke, args=(question,), kwargs={"priority": priority})
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: gateway.metrics()["queued"] == queued)
+
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert order == ["blocker", "generation", "grading"]
+
+
+def test_hedge_win_keeps_primary_slot_until_it_finishes():
+    llm = ScriptedLLM(["primary", "hedge"], delays={0: 0.5})
+    gateway = LLMGateway(llm, gateway_config(hedge_after_seconds=0.05))
+
+    start = time.monotonic()
+    result = gateway.invoke("question")
+
+    assert time.monotonic() - start < 0.4
+    metrics = gateway.metrics()
+    assert metrics["hedges"] == 1
+    assert metrics["hedge_wins"] == 1
+    # The slow primary is still running and must still count against max_concurrency
+    assert metrics["in_flight"] == 1
+    assert result.content in ("primary", "hedge")
+    wait_until(lambda: gateway.metrics()["in_flight"] == 0)
+
+
+def test_groq_client_leaves_retries_to_the_gateway(monkeypatch):
+    pytest.importorskip("langchain_groq")
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+
+    model = ModelLoader()._create_llm("langchain_groq", "test-model")
+
+    assert model.max_retries == 0
@@ -0,0 +1,53 @@
+import pytest
+import yaml
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_core.documents import Document
+from project.model.retriever import DocumentRetriever
+from project.utils import model_loader
+from project.utils.model_loader import ModelLoader
+
+
+def child(parent_id, score):
+    metadata = {"rerank_score": score}
+    if parent_id is not None:
+        metadata["parent_id"] = parent_id
+    return Document(page_content=f"child of {parent_id} ({score})", metadata=metadata)
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump({
+        "llm": {"provider": "fake", "model": "fake-test", "fake_responses": ["unused"]},
+    }))
+    monkeypatch.setattr(ModelLoader, "load_embeddings", lambda self: FakeEmbeddings(size=8))
+    retriever = DocumentRetriever(str(path))
+    retriever.parent_store = {
+        parent_id: Document(page_content=f"section {parent_id}", metadata={"parent_id": parent_id})
+        for parent_id in ("a", "b", "c")
+    }
+    yield retriever
+    model_loader._gateways.clear()
+
+
+def test_siblings_collapse_to_best_ranked_child(retriever):
+    children = [child("a", 0.9), child("b", 0.8), child("a", 0.7), child("b", 0.6)]
+
+    parents = retriever.expand_to_parents(children, top_k=3)
+
+    assert [parent.page_content for parent in parents] == ["section a", "section b"]
+    assert [parent.metadata["rerank_score"] for parent in parents] == [0.9, 0.8]
+    # The parent store entries are not mutated by the score copy
+    assert "rerank_score" not in retriever.parent_store["a"].metadata
+
+
+def test_parentless_children_count_towards_top_k(retriever):
+    children = [child(None, 0.95), child("a", 0.9), child("missing", 0.85), child("a", 0.8), child("c", 0.7)]
+
+    parents = retriever.expand_to_parents(children, top_k=3)
+
+    assert len(parents) == 3
+    assert [parent.page_content for parent in parents] == [
+        "child of None (0.95)", "section a", "child of missing (0.85)"
+    ]
+    assert len(retriever.expand_to_parents(children, top_k=2)) == 2
@@ -0,0 +1,116 @@
+import threading
+import time
+import pytest
+import yaml
+from project.model.web_search import StaticSearchProvider, WebSearcher, WebSearchProvider
+
+RESULTS = [{"content": "web answer", "url": "https://example.com"}]
+
+
+class BlockingProvider(WebSearchProvider):
+    name = "blocking"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def search(self, query, max_results):
+        self.calls += 1
+        self.release.wait(2)
+        return RESULTS
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def make_searcher(tmp_path):
+    searchers = []
+
+    def make(provider, **overrides):
+        search_config = {"timeout_seconds": 1, "cache_ttl_seconds": 60, "cache_size": 8, "max_workers": 2}
+        search_config.update(overrides)
+        path = tmp_path / "config.yaml"
+        path.write_text(yaml.safe_dump({"web_search": search_config}))
+        searcher = WebSearcher(provider, str(path))
+        searchers.append(searcher)
+        return searcher
+
+    yield make
+    for searcher in searchers:
+        searcher.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_provider_interface_is_abstract():
+    with pytest.raises(TypeError):
+        WebSearchProvider()
+
+
+def test_results_are_cached_until_ttl_expires(make_searcher):
+    provider = StaticSearchProvider(RESULTS)
+    searcher = make_searcher(provider, cache_ttl_seconds=0.1)
+
+    assert searcher.search("What is CRAG?")[0].page_content == "web answer"
+    assert searcher.search("  what is   crag? ")[0].metadata["source"] == "https://example.com"
+    assert provider.calls == 1
+
+    time.sleep(0.15)
+    searcher.search("What is CRAG?")
+    assert provider.calls == 2
+
+
+def test_cache_evicts_least_recently_used(make_searcher):
+    provider = StaticSearchProvider(RESULTS)
+    searcher = make_searcher(provider, cache_size=2)
+
+    for query in ("first", "second", "first", "third"):
+        searcher.search(query)
+    assert list(searcher._cache) == ["first", "third"]
+
+    searcher.search("second")
+    assert provider.calls == 4
+
+
+def test_concurrent_searches_share_one_provider_call(make_searcher):
+    provider = StaticSearchProvider(RESULTS, delay=0.1)
+    searcher = make_searcher(provider)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(searcher.search("query"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+
+    assert provider.calls == 1
+    assert len(results) == 4 and all(len(documents) == 1 for documents in results)
+
+
+def test_deadline_returns_no_results(make_searcher):
+    provider = StaticSearchProvider(RESULTS, delay=0.3)
+    searcher = make_searcher(provider)
+
+    start = time.monotonic()
+    assert searcher.search("slow query", timeout=0.05) == []
+    assert time.monotonic() - start < 0.2
+
+
+def test_skips_searches_while_all_workers_are_overdue(make_searcher):
+    provider = BlockingProvider()
+    searcher = make_searcher(provider, timeout_seconds=0.05, max_workers=2)
+
+    assert searcher.search("first") == []
+    assert searcher.search("second") == []
+    time.sleep(0.06)
+
+    assert searcher.search("third") == []
+    assert provider.calls == 2
+    assert "third" not in searcher._in_flight
+
+    provider.release.set()
+    wait_until(lambda: not searcher._running)
+    assert searcher.search("third", timeout=1)[0].page_content == "web answer"